@@ -8,8 +8,8 @@ Usage:
 Example:
     omni-agent --workspace /path/to/project
 """
-from omni_agent.cli.commands import AVAILABLE_COMMANDS
+from omni_agent.cli.commands import AVAILABLE_COMMANDS, COMMAND_SET
 from omni_agent.cli.display import Colors
 from omni_agent.cli.main import main
 
-__all__ = ["main", "Colors", "AVAILABLE_COMMANDS"]
+__all__ = ["main", "Colors", "AVAILABLE_COMMANDS", "COMMAND_SET"]
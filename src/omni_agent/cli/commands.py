@@ -1,4 +1,7 @@
 """斜杠命令的 CLI 命令处理器。"""
+import sys
+from collections import Counter
+from collections.abc import Mapping
 from datetime import datetime
 from typing import TYPE_CHECKING
 
@@ -8,7 +11,8 @@ if TYPE_CHECKING:
     from omni_agent.core.agent import Agent
 
 
-AVAILABLE_COMMANDS = [
+# Ordered for tab completion
+AVAILABLE_COMMANDS = (
     "/help",
     "/clear",
     "/history",
@@ -18,12 +22,15 @@ AVAILABLE_COMMANDS = [
     "/exit",
     "/quit",
     "/q",
-]
+)
 
+# Hash-based lookups for command dispatch
+COMMAND_SET = frozenset(AVAILABLE_COMMANDS)
+EXIT_COMMANDS = frozenset(("/exit", "/quit", "/q"))
+EXIT_SHORTCUTS = frozenset(("exit", "quit", "q"))
 
-def print_help() -> None:
-    """Print help information."""
-    help_text = f"""
+# Built once at import; the text only depends on static color codes.
+_HELP_TEXT = f"""
 {Colors.BOLD}{Colors.BRIGHT_YELLOW}Available Commands:{Colors.RESET}
   {Colors.BRIGHT_GREEN}/help{Colors.RESET}      - Show this help message
   {Colors.BRIGHT_GREEN}/clear{Colors.RESET}     - Clear session history (keep system prompt)
@@ -49,7 +56,17 @@ def print_help() -> None:
   - Press {Colors.BRIGHT_CYAN}Enter{Colors.RESET} to submit your message
   - Use {Colors.BRIGHT_CYAN}Ctrl+J{Colors.RESET} to insert line breaks
 """
-    print(help_text)
+
+# History labels; counts are substituted with % at call time
+_LBL_SYSTEM = f"    - System: {Colors.DIM}%d{Colors.RESET}"
+_LBL_USER = f"    - User: {Colors.BRIGHT_GREEN}%d{Colors.RESET}"
+_LBL_ASSISTANT = f"    - Assistant: {Colors.BRIGHT_BLUE}%d{Colors.RESET}"
+_LBL_TOOL = f"    - Tool: {Colors.BRIGHT_YELLOW}%d{Colors.RESET}"
+
+
+def print_help() -> None:
+    """Print help information."""
+    print(_HELP_TEXT)
 
 
 def handle_clear(agent: "Agent") -> int:
@@ -66,25 +83,31 @@ def handle_clear(agent: "Agent") -> int:
     return old_count - 1
 
 
-def handle_history(agent: "Agent") -> None:
+def handle_history(agent: "Agent", role_counts: Mapping[str, int] | None = None) -> None:
     """Show message history count.
 
     Args:
         agent: Agent instance
+        role_counts: Pre-computed per-role message counts (counted here if omitted)
     """
-    # Count by type
-    user_msgs = sum(1 for m in agent.messages if m.role == "user")
-    assistant_msgs = sum(1 for m in agent.messages if m.role == "assistant")
-    tool_msgs = sum(1 for m in agent.messages if m.role == "tool")
-    system_msgs = sum(1 for m in agent.messages if m.role == "system")
-
-    print(f"\n{Colors.BRIGHT_CYAN}Message History:{Colors.RESET}")
-    print(f"  Total: {len(agent.messages)} messages")
-    print(f"    - System: {Colors.DIM}{system_msgs}{Colors.RESET}")
-    print(f"    - User: {Colors.BRIGHT_GREEN}{user_msgs}{Colors.RESET}")
-    print(f"    - Assistant: {Colors.BRIGHT_BLUE}{assistant_msgs}{Colors.RESET}")
-    print(f"    - Tool: {Colors.BRIGHT_YELLOW}{tool_msgs}{Colors.RESET}")
-    print()
+    # Count by type in a single pass
+    if role_counts is None:
+        role_counts = Counter(m.role for m in agent.messages)
+    user_msgs = role_counts.get("user", 0)
+    assistant_msgs = role_counts.get("assistant", 0)
+    tool_msgs = role_counts.get("tool", 0)
+    system_msgs = role_counts.get("system", 0)
+
+    lines = [
+        f"\n{Colors.BRIGHT_CYAN}Message History:{Colors.RESET}",
+        f"  Total: {len(agent.messages)} messages",
+        _LBL_SYSTEM % system_msgs,
+        _LBL_USER % user_msgs,
+        _LBL_ASSISTANT % assistant_msgs,
+        _LBL_TOOL % tool_msgs,
+        "",
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def handle_tools(agent: "Agent") -> None:
@@ -93,13 +116,14 @@ def handle_tools(agent: "Agent") -> None:
     Args:
         agent: Agent instance
     """
-    print(f"\n{Colors.BOLD}{Colors.BRIGHT_CYAN}Available Tools ({len(agent.tools)}):{Colors.RESET}")
+    lines = [f"\n{Colors.BOLD}{Colors.BRIGHT_CYAN}Available Tools ({len(agent.tools)}):{Colors.RESET}"]
     for name, tool in agent.tools.items():
         desc = tool.description
         if len(desc) > 60:
             desc = desc[:60] + "..."
-        print(f"  {Colors.BRIGHT_GREEN}{name}{Colors.RESET}: {Colors.DIM}{desc}{Colors.RESET}")
-    print()
+        lines.append(f"  {Colors.BRIGHT_GREEN}{name}{Colors.RESET}: {Colors.DIM}{desc}{Colors.RESET}")
+    lines.append("")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def handle_session(session_id: str, workspace_dir: str) -> None:
@@ -109,17 +133,21 @@ def handle_session(session_id: str, workspace_dir: str) -> None:
         session_id: Session identifier
         workspace_dir: Workspace directory path
     """
-    print(f"\n{Colors.BRIGHT_CYAN}Session Info:{Colors.RESET}")
-    print(f"  Session ID: {Colors.BRIGHT_GREEN}{session_id}{Colors.RESET}")
-    print(f"  Workspace: {Colors.DIM}{workspace_dir}{Colors.RESET}")
-    print(f"  Time: {Colors.DIM}{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}{Colors.RESET}")
-    print()
+    lines = [
+        f"\n{Colors.BRIGHT_CYAN}Session Info:{Colors.RESET}",
+        f"  Session ID: {Colors.BRIGHT_GREEN}{session_id}{Colors.RESET}",
+        f"  Workspace: {Colors.DIM}{workspace_dir}{Colors.RESET}",
+        f"  Time: {Colors.DIM}{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}{Colors.RESET}",
+        "",
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def handle_stats_command(
     agent: "Agent",
     session_start: datetime,
     tool_calls_count: int,
+    role_counts: Mapping[str, int] | None = None,
 ) -> None:
     """Handle /stats command.
 
@@ -127,5 +155,6 @@ def handle_stats_command(
         agent: Agent instance
         session_start: Session start time
         tool_calls_count: Total tool calls
+        role_counts: Pre-computed per-role message counts
     """
-    print_stats(agent, session_start, tool_calls_count)
+    print_stats(agent, session_start, tool_calls_count, role_counts)
@@ -1,5 +1,8 @@
 """ANSI 颜色定义和 CLI 输出显示工具。"""
 import re
+import sys
+from collections import Counter
+from collections.abc import Mapping
 from datetime import datetime
 from typing import TYPE_CHECKING, Any
 
@@ -41,6 +44,9 @@ class Colors:
     BG_BLUE = "\033[44m"
 
 
+_ANSI_ESCAPE = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
+
+
 def calculate_display_width(text: str) -> int:
     """Calculate display width accounting for ANSI codes and CJK characters.
 
@@ -51,8 +57,7 @@ def calculate_display_width(text: str) -> int:
         Display width in terminal columns
     """
     # Strip ANSI codes for width calculation
-    ansi_escape = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
-    clean_text = ansi_escape.sub("", text)
+    clean_text = _ANSI_ESCAPE.sub("", text)
 
     # Account for CJK characters (width 2)
     width = 0
@@ -71,26 +76,61 @@ def calculate_display_width(text: str) -> int:
     return width
 
 
+def _center_line(text: str, width: int) -> str:
+    """Pad text on both sides so that its display width equals width."""
+    left_padding, odd = divmod(width - calculate_display_width(text), 2)
+    return f"{' ' * left_padding}{text}{' ' * (left_padding + odd)}"
+
+
+# Static box fragments, built once at import time instead of on every call.
+_BOX_WIDTH = 58
+_BOX_TOP = f"{Colors.DIM}+{'-' * _BOX_WIDTH}+{Colors.RESET}"
+_BOX_DIVIDER = _BOX_TOP
+_BOX_BOTTOM = _BOX_TOP
+_BOX_EDGE = f"{Colors.DIM}|{Colors.RESET}"
+
+_BANNER_BORDER = f"{Colors.BOLD}{Colors.BRIGHT_CYAN}{'=' * (_BOX_WIDTH + 2)}{Colors.RESET}"
+_BANNER_EDGE = f"{Colors.BOLD}{Colors.BRIGHT_CYAN}|{Colors.RESET}"
+_BANNER_TEXT = (
+    f"{_BANNER_EDGE}"
+    f"{_center_line(f'{Colors.BOLD}Omni Agent - Multi-turn Interactive Session{Colors.RESET}', _BOX_WIDTH)}"
+    f"{_BANNER_EDGE}"
+)
+
+_HEADER_SESSION_INFO = (
+    f"{_BOX_EDGE} "
+    f"{_center_line(f'{Colors.BRIGHT_CYAN}Session Info{Colors.RESET}', _BOX_WIDTH - 1)}"
+    f"{_BOX_EDGE}"
+)
+_SESSION_HINT = (
+    f"{Colors.DIM}Type {Colors.BRIGHT_GREEN}/help{Colors.DIM} for help, "
+    f"{Colors.BRIGHT_GREEN}/exit{Colors.DIM} to quit{Colors.RESET}"
+)
+
+# Collapses line breaks and tabs so tool results stay on one line
+_NL_TRANSLATE = str.maketrans({"\n": " ", "\r": " ", "\t": " "})
+
+_STATS_HEADER = f"\n{Colors.BOLD}{Colors.BRIGHT_CYAN}Session Statistics:{Colors.RESET}"
+_SEP_LINE_40 = f"{Colors.DIM}{'-' * 40}{Colors.RESET}"
+_LBL_STATS_USER = f"    - User Messages: {Colors.BRIGHT_GREEN}%d{Colors.RESET}\n"
+_LBL_STATS_ASSISTANT = f"    - Assistant Replies: {Colors.BRIGHT_BLUE}%d{Colors.RESET}\n"
+_LBL_STATS_TOOL = f"    - Tool Results: {Colors.BRIGHT_YELLOW}%d{Colors.RESET}\n"
+_LBL_STATS_CALLS = f"  Tool Calls: {Colors.BRIGHT_MAGENTA}%d{Colors.RESET}\n"
+
+
 def print_banner() -> None:
     """Print welcome banner with proper alignment."""
-    BOX_WIDTH = 58
-    banner_text = f"{Colors.BOLD}Omni Agent - Multi-turn Interactive Session{Colors.RESET}"
-    banner_width = calculate_display_width(banner_text)
-
-    # Center the text with proper padding
-    total_padding = BOX_WIDTH - banner_width
-    left_padding = total_padding // 2
-    right_padding = total_padding - left_padding
-
-    print()
-    print(f"{Colors.BOLD}{Colors.BRIGHT_CYAN}{'=' * (BOX_WIDTH + 2)}{Colors.RESET}")
-    print(
-        f"{Colors.BOLD}{Colors.BRIGHT_CYAN}|{Colors.RESET}"
-        f"{' ' * left_padding}{banner_text}{' ' * right_padding}"
-        f"{Colors.BOLD}{Colors.BRIGHT_CYAN}|{Colors.RESET}"
-    )
-    print(f"{Colors.BOLD}{Colors.BRIGHT_CYAN}{'=' * (BOX_WIDTH + 2)}{Colors.RESET}")
-    print()
+    sys.stdout.write(f"\n{_BANNER_BORDER}\n{_BANNER_TEXT}\n{_BANNER_BORDER}\n\n")
+
+
+def _info_line(text: str) -> str:
+    """Build a single session info line with proper padding.
+
+    ``text`` carries no ANSI codes, so ``str.ljust`` can pad it directly once
+    the target length is corrected for double-width (CJK) characters.
+    """
+    extra_width = calculate_display_width(text) - len(text)
+    return f"{_BOX_EDGE} {text.ljust(_BOX_WIDTH - 1 - extra_width)}{_BOX_EDGE}\n"
 
 
 def print_session_info(
@@ -101,58 +141,33 @@ def print_session_info(
 ) -> None:
     """Print session information box.
 
+    The whole box is assembled first and written with a single call.
+
     Args:
         agent: Agent instance
         workspace_dir: Workspace directory path
         model: Model name
         tools_count: Number of tools loaded
     """
-    BOX_WIDTH = 58
-
-    def print_info_line(text: str) -> None:
-        """Print a single info line with proper padding."""
-        text_width = calculate_display_width(text)
-        padding = max(0, BOX_WIDTH - 1 - text_width)
-        print(f"{Colors.DIM}|{Colors.RESET} {text}{' ' * padding}{Colors.DIM}|{Colors.RESET}")
-
-    # Top border
-    print(f"{Colors.DIM}+{'-' * BOX_WIDTH}+{Colors.RESET}")
-
-    # Header (centered)
-    header_text = f"{Colors.BRIGHT_CYAN}Session Info{Colors.RESET}"
-    header_width = calculate_display_width(header_text)
-    header_padding_total = BOX_WIDTH - 1 - header_width
-    header_padding_left = header_padding_total // 2
-    header_padding_right = header_padding_total - header_padding_left
-    print(
-        f"{Colors.DIM}|{Colors.RESET} "
-        f"{' ' * header_padding_left}{header_text}{' ' * header_padding_right}"
-        f"{Colors.DIM}|{Colors.RESET}"
-    )
-
-    # Divider
-    print(f"{Colors.DIM}+{'-' * BOX_WIDTH}+{Colors.RESET}")
-
-    # Info lines
-    print_info_line(f"Model: {model}")
-    print_info_line(f"Workspace: {workspace_dir}")
-    print_info_line(f"Message History: {len(agent.messages)} messages")
-    print_info_line(f"Available Tools: {tools_count} tools")
-
-    # Bottom border
-    print(f"{Colors.DIM}+{'-' * BOX_WIDTH}+{Colors.RESET}")
-    print()
-    print(
-        f"{Colors.DIM}Type {Colors.BRIGHT_GREEN}/help{Colors.DIM} for help, "
-        f"{Colors.BRIGHT_GREEN}/exit{Colors.DIM} to quit{Colors.RESET}"
-    )
-    print()
+    parts: list[str] = [
+        # Top border, centered header, divider
+        f"{_BOX_TOP}\n{_HEADER_SESSION_INFO}\n{_BOX_DIVIDER}\n",
+        # Info lines
+        _info_line(f"Model: {model}"),
+        _info_line(f"Workspace: {workspace_dir}"),
+        _info_line(f"Message History: {len(agent.messages)} messages"),
+        _info_line(f"Available Tools: {tools_count} tools"),
+        # Bottom border
+        f"{_BOX_BOTTOM}\n\n{_SESSION_HINT}\n\n",
+    ]
+    sys.stdout.write("".join(parts))
 
 
 def print_stats(
     agent: "Agent",
     session_start: datetime,
     tool_calls_count: int,
+    role_counts: Mapping[str, int] | None = None,
 ) -> None:
     """Print session statistics.
 
@@ -160,25 +175,62 @@ def print_stats(
         agent: Agent instance
         session_start: Session start time
         tool_calls_count: Total tool calls made
+        role_counts: Pre-computed per-role message counts (counted here if omitted)
     """
     duration = datetime.now() - session_start
     hours, remainder = divmod(int(duration.total_seconds()), 3600)
     minutes, seconds = divmod(remainder, 60)
 
-    # Count different types of messages
-    user_msgs = sum(1 for m in agent.messages if m.role == "user")
-    assistant_msgs = sum(1 for m in agent.messages if m.role == "assistant")
-    tool_msgs = sum(1 for m in agent.messages if m.role == "tool")
-
-    print(f"\n{Colors.BOLD}{Colors.BRIGHT_CYAN}Session Statistics:{Colors.RESET}")
-    print(f"{Colors.DIM}{'-' * 40}{Colors.RESET}")
-    print(f"  Session Duration: {hours:02d}:{minutes:02d}:{seconds:02d}")
-    print(f"  Total Messages: {len(agent.messages)}")
-    print(f"    - User Messages: {Colors.BRIGHT_GREEN}{user_msgs}{Colors.RESET}")
-    print(f"    - Assistant Replies: {Colors.BRIGHT_BLUE}{assistant_msgs}{Colors.RESET}")
-    print(f"    - Tool Results: {Colors.BRIGHT_YELLOW}{tool_msgs}{Colors.RESET}")
-    print(f"  Tool Calls: {Colors.BRIGHT_MAGENTA}{tool_calls_count}{Colors.RESET}")
-    print(f"{Colors.DIM}{'-' * 40}{Colors.RESET}\n")
+    # Count different types of messages in a single pass
+    if role_counts is None:
+        role_counts = Counter(m.role for m in agent.messages)
+    user_msgs = role_counts.get("user", 0)
+    assistant_msgs = role_counts.get("assistant", 0)
+    tool_msgs = role_counts.get("tool", 0)
+
+    parts: list[str] = [
+        f"{_STATS_HEADER}\n",
+        f"{_SEP_LINE_40}\n",
+        f"  Session Duration: {hours:02d}:{minutes:02d}:{seconds:02d}\n",
+        f"  Total Messages: {len(agent.messages)}\n",
+        _LBL_STATS_USER % user_msgs,
+        _LBL_STATS_ASSISTANT % assistant_msgs,
+        _LBL_STATS_TOOL % tool_msgs,
+        _LBL_STATS_CALLS % tool_calls_count,
+        f"{_SEP_LINE_40}\n\n",
+    ]
+    sys.stdout.write("".join(parts))
+
+
+def _repr_bounded(arguments: dict, limit: int) -> str:
+    """Render arguments like ``str(arguments)``, truncated to ``limit`` chars.
+
+    Stops once ``limit`` characters have been produced and only reprs the head
+    of long string values, so large payloads (e.g. file contents) are never
+    stringified in full.
+    """
+    if not isinstance(arguments, dict):
+        text = str(arguments)
+        return text[:limit] + "..." if len(text) > limit else text
+
+    parts = ["{"]
+    size = 1
+    for index, (key, value) in enumerate(arguments.items()):
+        if size > limit:
+            break
+        if isinstance(value, str) and len(value) > limit:
+            # Only the head can ever be displayed; the closing quote of the
+            # shortened repr always lands past the cut.
+            value = value[:limit]
+        piece = f"{', ' if index else ''}{key!r}: {value!r}"
+        parts.append(piece)
+        size += len(piece)
+    else:
+        parts.append("}")
+        size += 1
+
+    text = "".join(parts)
+    return text[:limit] + "..." if size > limit else text
 
 
 def format_tool_call(tool_name: str, arguments: dict) -> str:
@@ -192,9 +244,7 @@ def format_tool_call(tool_name: str, arguments: dict) -> str:
         Formatted string for display
     """
     # Truncate arguments display
-    args_str = str(arguments)
-    if len(args_str) > 100:
-        args_str = args_str[:100] + "..."
+    args_str = _repr_bounded(arguments, 100)
 
     return (
         f"{Colors.BRIGHT_YELLOW}[Tool]{Colors.RESET} "
@@ -223,10 +273,10 @@ def format_tool_result(
     status = f"{Colors.GREEN}OK{Colors.RESET}" if success else f"{Colors.RED}FAIL{Colors.RESET}"
     time_str = f"{execution_time * 1000:.0f}ms"
 
-    # Truncate content
+    # Truncate first so the whitespace pass only touches what is displayed
     if len(content) > 150:
         content = content[:150] + "..."
-    content = content.replace("\n", " ")
+    content = content.translate(_NL_TRANSLATE)
 
     return (
         f"{Colors.DIM}  -> [{status}] {time_str}{Colors.RESET} "
@@ -34,6 +34,9 @@ from omni_agent.schemas.message import Message
 
 from omni_agent.cli.commands import (
     AVAILABLE_COMMANDS,
+    COMMAND_SET,
+    EXIT_COMMANDS,
+    EXIT_SHORTCUTS,
     handle_clear,
     handle_history,
     handle_session,
@@ -257,7 +260,7 @@ async def run_agent_cli(
 
     # 9. Setup prompt_toolkit
     command_completer = WordCompleter(
-        AVAILABLE_COMMANDS,
+        list(AVAILABLE_COMMANDS),
         ignore_case=True,
         sentence=True,
     )
@@ -318,9 +321,19 @@ async def run_agent_cli(
             if user_input.startswith("/"):
                 command = user_input.lower()
 
-                if command in ["/exit", "/quit", "/q"]:
+                if command not in COMMAND_SET:
+                    print(f"{Colors.RED}Unknown command: {user_input}{Colors.RESET}")
+                    print(f"{Colors.DIM}Type /help for available commands{Colors.RESET}\n")
+                    continue
+
+                if command in EXIT_COMMANDS:
                     print(f"\n{Colors.BRIGHT_YELLOW}Goodbye! Thanks for using Omni Agent{Colors.RESET}\n")
-                    print_stats(agent, session_start, session_handler.tool_calls_count)
+                    print_stats(
+                        agent,
+                        session_start,
+                        session_handler.tool_calls_count,
+                        session_handler.count_roles(agent.messages),
+                    )
                     break
 
                 elif command == "/help":
@@ -329,11 +342,12 @@ async def run_agent_cli(
 
                 elif command == "/clear":
                     cleared = handle_clear(agent)
+                    session_handler.reset_role_counts()
                     print(f"{Colors.GREEN}Cleared {cleared} messages{Colors.RESET}\n")
                     continue
 
                 elif command == "/history":
-                    handle_history(agent)
+                    handle_history(agent, session_handler.count_roles(agent.messages))
                     continue
 
                 elif command == "/tools":
@@ -341,22 +355,27 @@ async def run_agent_cli(
                     continue
 
                 elif command == "/stats":
-                    handle_stats_command(agent, session_start, session_handler.tool_calls_count)
+                    handle_stats_command(
+                        agent,
+                        session_start,
+                        session_handler.tool_calls_count,
+                        session_handler.count_roles(agent.messages),
+                    )
                     continue
 
                 elif command == "/session":
                     handle_session(session_handler.session_id, str(workspace_dir))
                     continue
 
-                else:
-                    print(f"{Colors.RED}Unknown command: {user_input}{Colors.RESET}")
-                    print(f"{Colors.DIM}Type /help for available commands{Colors.RESET}\n")
-                    continue
-
             # Exit shortcuts
-            if user_input.lower() in ["exit", "quit", "q"]:
+            if user_input.lower() in EXIT_SHORTCUTS:
                 print(f"\n{Colors.BRIGHT_YELLOW}Goodbye!{Colors.RESET}\n")
-                print_stats(agent, session_start, session_handler.tool_calls_count)
+                print_stats(
+                    agent,
+                    session_start,
+                    session_handler.tool_calls_count,
+                    session_handler.count_roles(agent.messages),
+                )
                 break
 
             # Run agent with streaming
@@ -455,13 +474,23 @@ async def run_agent_cli(
 
         except KeyboardInterrupt:
             print(f"\n\n{Colors.BRIGHT_YELLOW}Interrupted. Exiting...{Colors.RESET}\n")
-            print_stats(agent, session_start, session_handler.tool_calls_count)
+            print_stats(
+                agent,
+                session_start,
+                session_handler.tool_calls_count,
+                session_handler.count_roles(agent.messages),
+            )
             break
 
         except EOFError:
             # Handle Ctrl+D
             print(f"\n\n{Colors.BRIGHT_YELLOW}Goodbye!{Colors.RESET}\n")
-            print_stats(agent, session_start, session_handler.tool_calls_count)
+            print_stats(
+                agent,
+                session_start,
+                session_handler.tool_calls_count,
+                session_handler.count_roles(agent.messages),
+            )
             break
 
         except Exception as e:
@@ -1,14 +1,30 @@
 """CLI 模式的会话处理。"""
 import uuid
+from collections import Counter
 from datetime import datetime
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from omni_agent.core.config import settings
 
+if TYPE_CHECKING:
+    from omni_agent.schemas.message import Message
+
 
 class CLISessionHandler:
     """Handles session persistence for CLI mode."""
 
+    __slots__ = (
+        "session_id",
+        "auto_save",
+        "_manager",
+        "_run_count",
+        "_start_time",
+        "_tool_calls_count",
+        "_role_counts",
+        "_counted_messages",
+        "_counted_len",
+    )
+
     def __init__(
         self,
         session_id: Optional[str] = None,
@@ -26,23 +42,27 @@ class CLISessionHandler:
         self._run_count = 0
         self._start_time = datetime.now()
         self._tool_calls_count = 0
+        self._role_counts: Counter[str] = Counter()
+        self._counted_messages: Optional[list["Message"]] = None
+        self._counted_len = 0
 
     async def initialize(self) -> None:
         """Initialize session manager based on settings."""
         if not settings.ENABLE_SESSION:
             return
 
+        backend = settings.SESSION_BACKEND
         try:
             from omni_agent.core.session_manager import UnifiedAgentSessionManager
 
             self._manager = UnifiedAgentSessionManager(
-                backend=settings.SESSION_BACKEND,
+                backend=backend,
                 storage_path=settings.SESSION_STORAGE_PATH,
                 redis_host=settings.SESSION_REDIS_HOST,
                 redis_port=settings.SESSION_REDIS_PORT,
                 redis_db=settings.SESSION_REDIS_DB,
                 redis_password=settings.SESSION_REDIS_PASSWORD or None,
-                postgres_dsn=settings.postgres_dsn if settings.SESSION_BACKEND == "postgres" else None,
+                postgres_dsn=settings.postgres_dsn if backend == "postgres" else None,
                 postgres_table=settings.SESSION_POSTGRES_TABLE,
                 ttl_seconds=settings.SESSION_MAX_AGE_DAYS * 86400,
             )
@@ -111,6 +131,32 @@ class CLISessionHandler:
         """
         self._tool_calls_count += count
 
+    def count_roles(self, messages: list["Message"]) -> Counter[str]:
+        """Get per-role message counts for the agent history.
+
+        Only messages appended since the previous call are counted. The agent
+        replaces its message list on /clear and when history is summarized,
+        so a different list object (or a shorter one) triggers a full recount.
+
+        Args:
+            messages: Agent message history
+
+        Returns:
+            Counter mapping role to number of messages
+        """
+        if messages is not self._counted_messages or len(messages) < self._counted_len:
+            self.reset_role_counts()
+            self._counted_messages = messages
+        self._role_counts.update(m.role for m in messages[self._counted_len:])
+        self._counted_len = len(messages)
+        return self._role_counts
+
+    def reset_role_counts(self) -> None:
+        """Forget cached role counts (e.g. after /clear)."""
+        self._role_counts = Counter()
+        self._counted_messages = None
+        self._counted_len = 0
+
     @property
     def tool_calls_count(self) -> int:
         """Get total tool calls count."""
@@ -129,12 +175,14 @@ class CLISessionHandler:
     @property
     def stats(self) -> dict:
         """Get session statistics."""
-        duration = datetime.now() - self._start_time
+        elapsed = int((datetime.now() - self._start_time).total_seconds())
+        hours, remainder = divmod(elapsed, 3600)
+        minutes, seconds = divmod(remainder, 60)
         return {
             "session_id": self.session_id,
             "run_count": self._run_count,
             "tool_calls_count": self._tool_calls_count,
-            "duration": str(duration).split(".")[0],
+            "duration": f"{hours}:{minutes:02d}:{seconds:02d}",
             "start_time": self._start_time.isoformat(),
         }
 
@@ -1,7 +1,5 @@
 """CLI 模式的工具加载（镜像 api/deps.py 模式）。"""
-import os
-import sys
-from contextlib import contextmanager
+import asyncio
 from pathlib import Path
 from typing import Optional
 
@@ -13,43 +11,6 @@ from omni_agent.tools.mcp_loader import cleanup_mcp_connections, load_mcp_tools_
 from omni_agent.tools.note_tool import RecallNoteTool, SessionNoteTool
 
 
-@contextmanager
-def suppress_output():
-    """Context manager to suppress stdout and stderr at OS level.
-
-    This is necessary to suppress output from MCP server subprocesses
-    which write directly to inherited file descriptors.
-    """
-    # Save original file descriptors
-    original_stdout_fd = os.dup(1)
-    original_stderr_fd = os.dup(2)
-
-    try:
-        # Open devnull
-        devnull = os.open(os.devnull, os.O_WRONLY)
-
-        # Redirect stdout and stderr to devnull
-        os.dup2(devnull, 1)
-        os.dup2(devnull, 2)
-        os.close(devnull)
-
-        # Also redirect Python's sys.stdout/stderr
-        sys.stdout = open(os.devnull, 'w')
-        sys.stderr = open(os.devnull, 'w')
-
-        yield
-    finally:
-        # Restore original file descriptors
-        os.dup2(original_stdout_fd, 1)
-        os.dup2(original_stderr_fd, 2)
-        os.close(original_stdout_fd)
-        os.close(original_stderr_fd)
-
-        # Restore Python's sys.stdout/stderr
-        sys.stdout = sys.__stdout__
-        sys.stderr = sys.__stderr__
-
-
 async def load_cli_tools(
     workspace_dir: str,
     enable_mcp: bool = True,
@@ -69,8 +30,14 @@ async def load_cli_tools(
     Returns:
         Tuple of (tools list, skill_loader or None)
     """
+    # Read settings once up front
+    skills_enabled = enable_skills and settings.ENABLE_SKILLS
+    mcp_enabled = enable_mcp and settings.ENABLE_MCP
+    rag_enabled = enable_rag and settings.ENABLE_RAG
+    skills_dir = settings.SKILLS_DIR
+    mcp_config_path = settings.MCP_CONFIG_PATH
+
     tools: list[Tool] = []
-    skill_loader: Optional[SkillLoader] = None
     workspace_path = Path(workspace_dir)
     workspace_path.mkdir(parents=True, exist_ok=True)
 
@@ -90,55 +57,70 @@ async def load_cli_tools(
     if verbose:
         print(f"{Colors.GREEN}Loaded {len(base_tools)} base tools{Colors.RESET}")
 
-    # 2. Skills (if enabled)
-    if enable_skills and settings.ENABLE_SKILLS:
+    # 2-4. Skills, MCP and RAG are independent, so load them concurrently.
+    # MCP server startup usually dominates; skills and RAG run in worker threads.
+    # Quiet MCP loading silences each server subprocess through its own errlog,
+    # so it never hides output from the other loaders.
+    async def _load_skills() -> tuple[list[Tool], Optional[SkillLoader]]:
+        if not skills_enabled:
+            return [], None
         if verbose:
             print(f"{Colors.BRIGHT_CYAN}Loading skills...{Colors.RESET}")
         try:
-            skill_tools, skill_loader = create_skill_tools(settings.SKILLS_DIR)
-            if skill_tools:
-                tools.extend(skill_tools)
-                skill_count = len(skill_loader.loaded_skills) if skill_loader else 0
-                if verbose:
-                    print(f"{Colors.GREEN}Loaded {skill_count} skills{Colors.RESET}")
+            skill_tools, loader = await asyncio.to_thread(create_skill_tools, skills_dir)
+            if skill_tools and verbose:
+                skill_count = len(loader.loaded_skills) if loader else 0
+                print(f"{Colors.GREEN}Loaded {skill_count} skills{Colors.RESET}")
+            return skill_tools, loader
         except Exception as e:
             if verbose:
                 print(f"{Colors.YELLOW}Warning: Failed to load skills: {e}{Colors.RESET}")
+            return [], None
 
-    # 3. MCP tools (if enabled)
-    if enable_mcp and settings.ENABLE_MCP:
+    async def _load_mcp() -> list[Tool]:
+        if not mcp_enabled:
+            return []
         if verbose:
-            print(f"{Colors.BRIGHT_CYAN}Loading MCP tools from: {settings.MCP_CONFIG_PATH}{Colors.RESET}")
+            print(f"{Colors.BRIGHT_CYAN}Loading MCP tools from: {mcp_config_path}{Colors.RESET}")
         try:
-            if verbose:
-                # Load with output visible
-                mcp_tools = await load_mcp_tools_async(settings.MCP_CONFIG_PATH)
-            else:
-                # Suppress all output from MCP server processes
-                with suppress_output():
-                    mcp_tools = await load_mcp_tools_async(settings.MCP_CONFIG_PATH)
-
-            if mcp_tools:
-                tools.extend(mcp_tools)
-                if verbose:
-                    print(f"{Colors.GREEN}Loaded {len(mcp_tools)} MCP tools{Colors.RESET}")
+            mcp_tools = await load_mcp_tools_async(mcp_config_path, quiet=not verbose)
+
+            if mcp_tools and verbose:
+                print(f"{Colors.GREEN}Loaded {len(mcp_tools)} MCP tools{Colors.RESET}")
+            return mcp_tools or []
         except Exception as e:
             if verbose:
                 print(f"{Colors.YELLOW}Warning: Failed to load MCP tools: {e}{Colors.RESET}")
+            return []
 
-    # 4. RAG tool (if enabled)
-    if enable_rag and settings.ENABLE_RAG:
+    async def _load_rag() -> list[Tool]:
+        if not rag_enabled:
+            return []
         if verbose:
             print(f"{Colors.BRIGHT_CYAN}Loading RAG tool...{Colors.RESET}")
         try:
-            from omni_agent.tools.rag_tool import RAGTool
 
-            tools.append(RAGTool())
+            def _create_rag_tool() -> Tool:
+                from omni_agent.tools.rag_tool import RAGTool
+
+                return RAGTool()
+
+            rag_tool = await asyncio.to_thread(_create_rag_tool)
             if verbose:
                 print(f"{Colors.GREEN}Loaded RAG tool{Colors.RESET}")
+            return [rag_tool]
         except Exception as e:
             if verbose:
                 print(f"{Colors.YELLOW}Warning: Failed to load RAG tool: {e}{Colors.RESET}")
+            return []
+
+    (skill_tools, skill_loader), mcp_tools, rag_tools = await asyncio.gather(
+        _load_skills(), _load_mcp(), _load_rag()
+    )
+    # Keep the same tool order as sequential loading
+    tools.extend(skill_tools)
+    tools.extend(mcp_tools)
+    tools.extend(rag_tools)
 
     if verbose:
         print()  # Empty line separator
@@ -154,11 +136,7 @@ async def cleanup_tools(verbose: bool = False) -> None:
     if verbose:
         print(f"{Colors.BRIGHT_CYAN}Cleaning up connections...{Colors.RESET}")
     try:
-        if verbose:
-            await cleanup_mcp_connections()
-        else:
-            with suppress_output():
-                await cleanup_mcp_connections()
+        await cleanup_mcp_connections(quiet=not verbose)
         if verbose:
             print(f"{Colors.GREEN}Cleanup complete{Colors.RESET}")
     except Exception as e:
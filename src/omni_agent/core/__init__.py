@@ -1,52 +1,129 @@
-"""Omni Agent 的核心模块。"""
-from .agent import (
-    Agent,
-    AgentEvent,
-    AgentLoop,
-    AgentState,
-    AgentStatus,
-    EventEmitter,
-    EventType,
-    HookManager,
-    LoopConfig,
-)
-from .hooks import AgentHook, HookContext
-from .agent_node import AgentNode, ToolNode, create_router
-from .checkpoint import (
-    Checkpoint,
-    CheckpointConfig,
-    CheckpointStorage,
-    FileCheckpointStorage,
-    MemoryCheckpointStorage,
-)
-from .config import settings
-from .graph import (
-    END,
-    START,
-    CompiledGraph,
-    Edge,
-    EdgeType,
-    GraphBuilder,
-    Node,
-    StateGraph,
-)
-from .llm_client import LLMClient
-from .memory import Memory, MemoryEntry, MemoryManager, MemoryType
-from .memory_hook import MemoryHook, create_memory_hook
-from .ralph import (
-    CompletionCondition,
-    CompletionDetector,
-    CompletionResult,
-    ContextManager,
-    ContextStrategy,
-    RalphConfig,
-    RalphLoop,
-    RalphState,
-    ToolResultCache,
-    WorkingMemory,
-)
-from .tool_executor import ToolExecutionResult, ToolExecutor
-from .workspace import WorkspaceManager, get_workspace_manager
+"""Omni Agent 的核心模块。
+
+Public names are resolved lazily (PEP 562): importing ``omni_agent.core`` or
+one of its light submodules (e.g. ``omni_agent.core.config``) no longer pulls
+in the agent loop, LLM client, graph and memory stacks until they are used.
+"""
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .agent import (
+        Agent,
+        AgentEvent,
+        AgentLoop,
+        AgentState,
+        AgentStatus,
+        EventEmitter,
+        EventType,
+        HookManager,
+        LoopConfig,
+    )
+    from .hooks import AgentHook, HookContext
+    from .agent_node import AgentNode, ToolNode, create_router
+    from .checkpoint import (
+        Checkpoint,
+        CheckpointConfig,
+        CheckpointStorage,
+        FileCheckpointStorage,
+        MemoryCheckpointStorage,
+    )
+    from .config import settings
+    from .graph import (
+        END,
+        START,
+        CompiledGraph,
+        Edge,
+        EdgeType,
+        GraphBuilder,
+        Node,
+        StateGraph,
+    )
+    from .llm_client import LLMClient
+    from .memory import Memory, MemoryEntry, MemoryManager, MemoryType
+    from .memory_hook import MemoryHook, create_memory_hook
+    from .ralph import (
+        CompletionCondition,
+        CompletionDetector,
+        CompletionResult,
+        ContextManager,
+        ContextStrategy,
+        RalphConfig,
+        RalphLoop,
+        RalphState,
+        ToolResultCache,
+        WorkingMemory,
+    )
+    from .tool_executor import ToolExecutionResult, ToolExecutor
+    from .workspace import WorkspaceManager, get_workspace_manager
+
+# Public name -> submodule that defines it
+_LAZY_IMPORTS: dict[str, str] = {
+    "Agent": ".agent",
+    "AgentEvent": ".agent",
+    "AgentLoop": ".agent",
+    "AgentState": ".agent",
+    "AgentStatus": ".agent",
+    "EventEmitter": ".agent",
+    "EventType": ".agent",
+    "HookManager": ".agent",
+    "LoopConfig": ".agent",
+    "AgentHook": ".hooks",
+    "HookContext": ".hooks",
+    "AgentNode": ".agent_node",
+    "ToolNode": ".agent_node",
+    "create_router": ".agent_node",
+    "Checkpoint": ".checkpoint",
+    "CheckpointConfig": ".checkpoint",
+    "CheckpointStorage": ".checkpoint",
+    "FileCheckpointStorage": ".checkpoint",
+    "MemoryCheckpointStorage": ".checkpoint",
+    "settings": ".config",
+    "END": ".graph",
+    "START": ".graph",
+    "CompiledGraph": ".graph",
+    "Edge": ".graph",
+    "EdgeType": ".graph",
+    "GraphBuilder": ".graph",
+    "Node": ".graph",
+    "StateGraph": ".graph",
+    "LLMClient": ".llm_client",
+    "Memory": ".memory",
+    "MemoryEntry": ".memory",
+    "MemoryManager": ".memory",
+    "MemoryType": ".memory",
+    "MemoryHook": ".memory_hook",
+    "create_memory_hook": ".memory_hook",
+    "CompletionCondition": ".ralph",
+    "CompletionDetector": ".ralph",
+    "CompletionResult": ".ralph",
+    "ContextManager": ".ralph",
+    "ContextStrategy": ".ralph",
+    "RalphConfig": ".ralph",
+    "RalphLoop": ".ralph",
+    "RalphState": ".ralph",
+    "ToolResultCache": ".ralph",
+    "WorkingMemory": ".ralph",
+    "ToolExecutionResult": ".tool_executor",
+    "ToolExecutor": ".tool_executor",
+    "WorkspaceManager": ".workspace",
+    "get_workspace_manager": ".workspace",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache on the package so later lookups bypass __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
 
 __all__ = [
     "Agent",
@@ -60,42 +137,42 @@ __all__ = [
     "CheckpointConfig",
     "CheckpointStorage",
     "CompiledGraph",
+    "CompletionCondition",
+    "CompletionDetector",
+    "CompletionResult",
+    "ContextManager",
+    "ContextStrategy",
     "END",
     "Edge",
     "EdgeType",
     "EventEmitter",
     "EventType",
     "FileCheckpointStorage",
-    "Memory",
-    "MemoryManager",
-    "MemoryEntry",
-    "MemoryType",
-    "MemoryHook",
-    "create_memory_hook",
     "GraphBuilder",
     "HookContext",
     "HookManager",
     "LLMClient",
     "LoopConfig",
+    "Memory",
     "MemoryCheckpointStorage",
+    "MemoryEntry",
+    "MemoryHook",
+    "MemoryManager",
+    "MemoryType",
     "Node",
+    "RalphConfig",
+    "RalphLoop",
+    "RalphState",
     "START",
     "StateGraph",
     "ToolExecutionResult",
     "ToolExecutor",
     "ToolNode",
+    "ToolResultCache",
+    "WorkingMemory",
     "WorkspaceManager",
+    "create_memory_hook",
     "create_router",
     "get_workspace_manager",
     "settings",
-    "CompletionCondition",
-    "CompletionDetector",
-    "CompletionResult",
-    "ContextManager",
-    "ContextStrategy",
-    "RalphConfig",
-    "RalphLoop",
-    "RalphState",
-    "ToolResultCache",
-    "WorkingMemory",
 ]
@@ -19,8 +19,13 @@
     3. 每步: LLM 生成 -> 解析工具调用 -> 执行工具 -> 添加结果到消息
     4. 直到: 无工具调用（完成）/ max_steps / 等待用户输入 / 错误
 """
+import asyncio
+import hashlib
 import json
+import logging
 import time
+from collections import OrderedDict, deque
+from contextlib import aclosing, asynccontextmanager, suppress
 from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
@@ -31,16 +36,82 @@ from omni_agent.core.checkpoint import Checkpoint, CheckpointConfig
 from omni_agent.core.langfuse_tracing import get_tracer, LangfuseTracer
 from omni_agent.core.llm_client import LLMClient
 from omni_agent.core.token_manager import TokenManager
-from omni_agent.core.tool_executor import ToolExecutor
+from omni_agent.core.tool_executor import ToolExecutionResult, ToolExecutor
 from omni_agent.core.prompt_builder import SystemPromptConfig, SystemPromptBuilder
-from omni_agent.schemas.message import Message, UserInputRequest, UserInputField, ToolCall
+from omni_agent.schemas.message import LLMResponse, Message, UserInputRequest, ToolCall
 from omni_agent.skills.skill_loader import SkillLoader
 from omni_agent.tools.base import Tool
-from omni_agent.tools.user_input_tool import GetUserInputTool, is_user_input_tool_call, parse_user_input_fields
-from omni_agent.core.ralph import RalphConfig, RalphLoop
+from omni_agent.tools.user_input_tool import GetUserInputTool, parse_user_input_fields
+from omni_agent.core.ralph import SUMMARY_INPUT_CHARS, RalphConfig, RalphLoop
 from omni_agent.core.hooks import AgentHook, HookContext
 from omni_agent.core.memory_hook import MemoryHook, create_memory_hook
 
+logger = logging.getLogger(__name__)
+
+
+_STREAM_END = object()
+
+# Step stream events run_stream must act on; deltas and tool events pass through
+_TERMINAL_STREAM_EVENTS = frozenset({"done", "user_input_required", "error"})
+
+# Checkpoint writes between two pruning passes over a thread
+_CKPT_PRUNE_INTERVAL = 10
+# Checkpoints whose ids are used to resume; written before _save_checkpoint returns
+_CKPT_DURABLE_TRIGGERS = frozenset({"user_input_wait"})
+
+# Token counts over more uncounted messages than this run in a worker thread
+_TOKEN_OFFLOAD_THRESHOLD = 32
+
+
+async def _buffered(
+    source: AsyncIterator[dict[str, Any]],
+    maxsize: int = 1,
+) -> AsyncIterator[dict[str, Any]]:
+    """Read ``source`` in a background task, up to ``maxsize`` items ahead.
+
+    Lets the producer (LLM stream, tool execution) keep working while the
+    consumer is still handling the previous item.
+
+    Args:
+        source: Async iterator to drain
+        maxsize: Number of items buffered ahead of the consumer
+
+    Yields:
+        Items of ``source`` in order; producer exceptions are re-raised
+    """
+    queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=maxsize)
+
+    async def produce() -> None:
+        try:
+            async for item in source:
+                await queue.put(item)
+        except BaseException as e:
+            # Our own cleanup (or an outer cancel) stops the producer quietly;
+            # anything raised by the source, CancelledError included, is
+            # forwarded so the consumer never waits on an empty queue.
+            task = asyncio.current_task()
+            assert task is not None
+            if task.cancelling():
+                raise
+            await queue.put(e)
+            return
+        await queue.put(_STREAM_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        if not producer.done():
+            producer.cancel()
+            with suppress(asyncio.CancelledError):
+                await producer
+
 
 class EventType(Enum):
     """Agent 事件类型.
@@ -63,7 +134,7 @@ class EventType(Enum):
     RALPH_COMPLETION = "ralph_completion"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class AgentEvent:
     """Agent 事件.
     
@@ -84,35 +155,125 @@ class EventEmitter:
     支持按事件类型注册处理器，也支持全局处理器接收所有事件。
     """
     def __init__(self) -> None:
-        self._handlers: dict[EventType, list[EventHandler]] = {}
+        # Keyed by the member's value: str hashes are cached, while
+        # Enum.__hash__ runs in Python on every lookup
+        self._handlers: dict[str, list[EventHandler]] = {}
         self._global_handlers: list[EventHandler] = []
+        self._pending: Optional[list[AgentEvent]] = None
+        self._flush_every = 0
+        self._any_handlers = False
+        # Global + typed handlers per event type, rebuilt after any change
+        self._dispatch_cache: dict[str, tuple[EventHandler, ...]] = {}
+
+    def _handlers_changed(self) -> None:
+        self._any_handlers = bool(self._global_handlers) or any(self._handlers.values())
+        self._dispatch_cache.clear()
 
     def on(self, event_type: EventType, handler: EventHandler) -> None:
-        if event_type not in self._handlers:
-            self._handlers[event_type] = []
-        self._handlers[event_type].append(handler)
+        self._handlers.setdefault(event_type._value_, []).append(handler)
+        self._handlers_changed()
+
+    def on_many(self, handlers: dict[EventType, EventHandler]) -> None:
+        """Register one handler for each event type in ``handlers``.
+
+        Args:
+            handlers: Mapping of event type to handler
+        """
+        registry = self._handlers
+        for event_type, handler in handlers.items():
+            registry.setdefault(event_type._value_, []).append(handler)
+        self._handlers_changed()
 
     def off(self, event_type: EventType, handler: EventHandler) -> None:
-        if event_type in self._handlers and handler in self._handlers[event_type]:
-            self._handlers[event_type].remove(handler)
+        handlers = self._handlers.get(event_type._value_)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+            self._handlers_changed()
+
+    def has_listeners(self, event_type: EventType) -> bool:
+        """Whether emitting ``event_type`` would reach any handler."""
+        if not self._any_handlers:
+            return False
+        return bool(self._global_handlers) or bool(self._handlers.get(event_type._value_))
 
     def on_all(self, handler: EventHandler) -> None:
         self._global_handlers.append(handler)
+        self._handlers_changed()
 
     def off_all(self, handler: EventHandler) -> None:
         if handler in self._global_handlers:
             self._global_handlers.remove(handler)
+            self._handlers_changed()
 
     async def emit(self, event: AgentEvent) -> None:
-        for handler in self._global_handlers:
-            await handler(event)
-        handlers = self._handlers.get(event.type, [])
-        for handler in handlers:
-            await handler(event)
+        if not self._any_handlers:
+            return
+        if self._pending is not None:
+            self._pending.append(event)
+            if len(self._pending) >= self._flush_every:
+                await self._flush()
+            return
+        await self._dispatch(event)
+
+    async def _dispatch(self, event: AgentEvent) -> None:
+        key = event.type._value_
+        handlers = self._dispatch_cache.get(key)
+        if handlers is None:
+            handlers = (*self._global_handlers, *self._handlers.get(key, ()))
+            self._dispatch_cache[key] = handlers
+        if not handlers:
+            return
+        if len(handlers) == 1:
+            await handlers[0](event)
+            return
+        # Handlers start in registration order; I/O-bound ones overlap.
+        # Every handler runs to completion before the first error is raised,
+        # so a failing handler never leaves the others running unowned.
+        results = await asyncio.gather(
+            *[handler(event) for handler in handlers], return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _flush(self) -> None:
+        pending = self._pending
+        if not pending:
+            return
+        self._pending = []
+        for event in pending:
+            await self._dispatch(event)
+
+    @asynccontextmanager
+    async def batch(self, flush_every: int = 32) -> AsyncIterator[None]:
+        """Buffer emitted events and dispatch them in order on exit.
+
+        Events are flushed early once ``flush_every`` are queued. Nested
+        batches join the outermost one. Queued events are still dispatched
+        if the body raises, and events emitted by handlers during the final
+        flush are dispatched too.
+
+        Args:
+            flush_every: Maximum number of queued events before a flush
+        """
+        if self._pending is not None:
+            yield
+            return
+        self._pending = []
+        self._flush_every = flush_every
+        try:
+            yield
+        finally:
+            try:
+                while self._pending:
+                    await self._flush()
+            finally:
+                self._pending = None
 
     def clear(self) -> None:
         self._handlers.clear()
         self._global_handlers.clear()
+        self._handlers_changed()
 
 
 class AgentStatus(Enum):
@@ -131,7 +292,7 @@ class AgentStatus(Enum):
     ERROR = "error"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class AgentState:
     """Agent 运行时状态.
     
@@ -149,6 +310,65 @@ class AgentState:
     error_message: Optional[str] = None
     last_checkpoint_id: Optional[str] = None
     thread_id: Optional[str] = None
+    cached_token_count: int = 0
+    _token_messages: Optional[list[Message]] = field(default=None, repr=False, compare=False)
+    _token_counted: int = field(default=0, repr=False, compare=False)
+    _user_messages: Optional[list[Message]] = field(default=None, repr=False, compare=False)
+    _user_scanned: int = field(default=0, repr=False, compare=False)
+    _last_user_idx: int = field(default=-1, repr=False, compare=False)
+
+    def sync_token_count(self, estimate: Callable[[Message], int]) -> int:
+        """Bring ``cached_token_count`` up to date with ``messages``.
+
+        Only messages appended since the last call are estimated; the count
+        restarts from scratch when the list is replaced (e.g. summarized)
+        or shrinks. Editing or swapping a message in place without changing
+        the list's length is not detected and is unsupported; assign a new
+        list instead.
+
+        Args:
+            estimate: Per-message token estimator
+
+        Returns:
+            Estimated token count of the whole history
+        """
+        messages = self.messages
+        if messages is not self._token_messages or len(messages) < self._token_counted:
+            self._token_messages = messages
+            self._token_counted = 0
+            self.cached_token_count = 0
+        for msg in messages[self._token_counted:]:
+            self.cached_token_count += estimate(msg)
+        self._token_counted = len(messages)
+        return self.cached_token_count
+
+    def uncounted_messages(self) -> int:
+        """Number of messages the next ``sync_token_count`` call will estimate."""
+        messages = self.messages
+        if messages is not self._token_messages or len(messages) < self._token_counted:
+            return len(messages)
+        return len(messages) - self._token_counted
+
+    def last_user_index(self) -> int:
+        """Return the index of the most recent user message.
+
+        Like ``sync_token_count``, only messages appended since the last call
+        are scanned; a replaced or shrunk list is rescanned from the start,
+        and same-length in-place edits are not detected.
+
+        Returns:
+            Position in ``messages``, or -1 if there is no user message
+        """
+        messages = self.messages
+        if messages is not self._user_messages or len(messages) < self._user_scanned:
+            self._user_messages = messages
+            self._user_scanned = 0
+            self._last_user_idx = -1
+        for i in range(self._user_scanned, len(messages)):
+            if messages[i].role == "user":
+                self._last_user_idx = i
+        self._user_scanned = len(messages)
+        return self._last_user_idx
 
     def reset_for_run(self, preserve_messages: bool = False) -> None:
         self.status = AgentStatus.RUNNING
@@ -188,7 +408,7 @@ class AgentState:
         self.error_message = message
 
     def resume_from_input(self) -> None:
-        if self.status == AgentStatus.WAITING_INPUT:
+        if self.status is AgentStatus.WAITING_INPUT:
             self.status = AgentStatus.RUNNING
             self.pending_user_input = None
             self.paused_tool_call_id = None
@@ -200,23 +420,23 @@ class AgentState:
 
     @property
     def is_running(self) -> bool:
-        return self.status == AgentStatus.RUNNING
+        return self.status is AgentStatus.RUNNING
 
     @property
     def is_waiting_input(self) -> bool:
-        return self.status == AgentStatus.WAITING_INPUT
+        return self.status is AgentStatus.WAITING_INPUT
 
     @property
     def is_completed(self) -> bool:
-        return self.status == AgentStatus.COMPLETED
+        return self.status is AgentStatus.COMPLETED
 
     @property
     def is_error(self) -> bool:
-        return self.status == AgentStatus.ERROR
+        return self.status is AgentStatus.ERROR
 
     @property
     def can_continue(self) -> bool:
-        return self.status == AgentStatus.RUNNING and self.current_step < self.max_steps
+        return self.status is AgentStatus.RUNNING and self.current_step < self.max_steps
 
     def to_checkpoint_data(self) -> dict:
         return {
@@ -251,30 +471,53 @@ class HookManager:
     支持 before_run、on_step、after_run 三个触发点。
     """
     def __init__(self) -> None:
-        self._hooks: list[AgentHook] = []
+        self._hooks: tuple[AgentHook, ...] = ()
+        self._before_run: tuple[Callable[..., Awaitable[None]], ...] = ()
+        self._on_step: tuple[Callable[..., Awaitable[None]], ...] = ()
+        self._after_run: tuple[Callable[..., Awaitable[None]], ...] = ()
+
+    def _set_hooks(self, hooks: tuple[AgentHook, ...]) -> None:
+        # Sorted once here; triggers iterate the pre-bound methods directly,
+        # skipping hooks that keep AgentHook's no-op implementation
+        self._hooks = tuple(sorted(hooks, key=lambda h: h.priority))
+        self._before_run = tuple(
+            h.before_run for h in self._hooks if type(h).before_run is not AgentHook.before_run
+        )
+        self._on_step = tuple(
+            h.on_step for h in self._hooks if type(h).on_step is not AgentHook.on_step
+        )
+        self._after_run = tuple(
+            h.after_run for h in self._hooks if type(h).after_run is not AgentHook.after_run
+        )
 
     def add(self, hook: AgentHook) -> None:
-        self._hooks.append(hook)
-        self._hooks.sort(key=lambda h: h.priority)
+        self._set_hooks((*self._hooks, hook))
 
     def remove(self, hook: AgentHook) -> None:
         if hook in self._hooks:
-            self._hooks.remove(hook)
+            hooks = list(self._hooks)
+            hooks.remove(hook)
+            self._set_hooks(tuple(hooks))
 
     def clear(self) -> None:
-        self._hooks.clear()
+        self._set_hooks(())
+
+    @property
+    def has_step_hooks(self) -> bool:
+        """Whether any hook implements ``on_step``."""
+        return bool(self._on_step)
 
     async def trigger_before_run(self, ctx: HookContext) -> None:
-        for hook in self._hooks:
-            await hook.before_run(ctx)
+        for fn in self._before_run:
+            await fn(ctx)
 
     async def trigger_on_step(self, ctx: HookContext, step_data: dict[str, Any]) -> None:
-        for hook in self._hooks:
-            await hook.on_step(ctx, step_data)
+        for fn in self._on_step:
+            await fn(ctx, step_data)
 
     async def trigger_after_run(self, ctx: HookContext, result: str, success: bool) -> None:
-        for hook in self._hooks:
-            await hook.after_run(ctx, result, success)
+        for fn in self._after_run:
+            await fn(ctx, result, success)
 
 
 ToolResultCallback = Callable[
@@ -283,23 +526,29 @@ ToolResultCallback = Callable[
 ]
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class LoopConfig:
     """执行循环配置.
 
     Attributes:
         max_steps: 最大执行步数
-        parallel_tools: 是否并行执行工具
+        parallel_tools: 是否并行执行工具（仅用于互不依赖的调用，结果仍按调用顺序返回）
         checkpoint: 断点续传配置
         on_tool_result: 工具执行后的回调 (tool_call_id, tool_name, arguments, content)
+        response_cache_size: 相同请求的 LLM 响应缓存条数（0 表示禁用，仅缓存不含工具调用的响应）
+        tail_token_budget: 发送给 LLM 的非 system 消息 token 上限（0 表示不截断）
+        stream_coalesce_chars: 流式增量合并输出的字符阈值（0 表示逐个输出）
     """
     max_steps: int = 50
     parallel_tools: bool = False
     checkpoint: Optional[CheckpointConfig] = None
     on_tool_result: Optional[ToolResultCallback] = None
+    response_cache_size: int = 0
+    tail_token_budget: int = 0
+    stream_coalesce_chars: int = 0
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class StepResult:
     """单步执行结果.
     
@@ -315,6 +564,96 @@ class StepResult:
     error: Optional[str] = None
 
 
+def _assistant_text_message(content: str, thinking: Optional[str]) -> Message:
+    # Fields come from already-validated LLM output; skip pydantic validation
+    return Message.model_construct(
+        role="assistant",
+        content=content,
+        thinking=thinking,
+        tool_calls=None,
+        tool_call_id=None,
+        name=None,
+    )
+
+
+def _assistant_tool_message(
+    content: str,
+    thinking: Optional[str],
+    tool_calls: list[ToolCall],
+) -> Message:
+    return Message.model_construct(
+        role="assistant",
+        content=content,
+        thinking=thinking,
+        tool_calls=tool_calls,
+        tool_call_id=None,
+        name=None,
+    )
+
+
+def _tool_message(content: str, tool_call_id: str, name: str) -> Message:
+    # Tool results are plain strings produced by the executor; skip validation
+    return Message.model_construct(
+        role="tool",
+        content=content,
+        thinking=None,
+        tool_calls=None,
+        tool_call_id=tool_call_id,
+        name=name,
+    )
+
+
+_USER_INPUT_TOOL_NAME = GetUserInputTool.TOOL_NAME
+
+
+def _find_user_input_call(tool_calls: list[ToolCall]) -> Optional[ToolCall]:
+    """Return the first call to the user-input tool, or None."""
+    for tool_call in tool_calls:
+        if tool_call.function.name == _USER_INPUT_TOOL_NAME:
+            return tool_call
+    return None
+
+
+class DeltaCoalescer:
+    """流式增量合并器.
+
+    将连续的 thinking/content 增量合并为较大的块，在累计字符数达到阈值、
+    距上次输出超过时间间隔或增量类型切换时输出。
+    """
+    __slots__ = ("_max_chars", "_interval", "_kind", "_parts", "_size", "_last_flush")
+
+    def __init__(self, max_chars: int, interval: float = 0.01) -> None:
+        self._max_chars = max_chars
+        self._interval = interval
+        self._kind: Optional[str] = None
+        self._parts: list[str] = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def _take(self) -> tuple[str, str]:
+        chunk = (self._kind or "", "".join(self._parts))
+        self._parts = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+        return chunk
+
+    def add(self, kind: str, delta: str) -> list[tuple[str, str]]:
+        """Queue a delta and return the ``(kind, text)`` chunks ready to emit."""
+        ready = []
+        if kind != self._kind and self._parts:
+            ready.append(self._take())
+        self._kind = kind
+        self._parts.append(delta)
+        self._size += len(delta)
+        if self._size >= self._max_chars or time.monotonic() - self._last_flush >= self._interval:
+            ready.append(self._take())
+        return ready
+
+    def flush(self) -> list[tuple[str, str]]:
+        """Return whatever is still buffered."""
+        return [self._take()] if self._parts else []
+
+
 class AgentLoop:
     """Agent 执行引擎.
 
@@ -341,16 +680,31 @@ class AgentLoop:
         self._events = event_emitter
         self._config = config or LoopConfig()
         self._tool_schemas: Optional[list[dict[str, Any]]] = None
+        self._tools_digest = hashlib.blake2b(b"null", digest_size=16)
         self._agent_id = agent_id or str(uuid4())
         self._hooks = HookManager()
+        self._response_cache: OrderedDict[bytes, LLMResponse] = OrderedDict()
+        # Rolling hash states for the last keyed request: _key_states[i] covers
+        # (tools, model, _key_messages[:i]), so each step only hashes new messages
+        self._key_messages: list[Message] = []
+        self._key_states: list[Any] = []
+        self._key_base: tuple[Any, str] = (None, "")
+        self._ckpt_task: Optional[asyncio.Task[None]] = None
+        self._ckpt_pending: Optional[dict[str, Any]] = None
+        self._ckpt_error: Optional[BaseException] = None
+        self._ckpt_unpruned = 0
+        self._ckpt_thread_id: Optional[str] = None
+        # Serialized form of the history prefix already checkpointed
+        self._ckpt_messages: list[dict[str, Any]] = []
+        self._ckpt_source: Optional[list[Message]] = None
+        self._ckpt_last_message: Optional[Message] = None
 
     @property
     def checkpoint_enabled(self) -> bool:
-        return (
-            self._config.checkpoint is not None
-            and self._config.checkpoint.enabled
-            and self._config.checkpoint.storage is not None
-        )
+        # Not cached: LoopConfig and CheckpointConfig are mutable and may be
+        # reconfigured between runs
+        config = self._config.checkpoint
+        return config is not None and config.enabled and config.storage is not None
 
     async def _save_checkpoint(
         self,
@@ -358,43 +712,197 @@ class AgentLoop:
         trigger: str,
         pending_tool_calls: Optional[list[ToolCall]] = None,
     ) -> Optional[str]:
+        """Snapshot ``state`` and write it to checkpoint storage.
+
+        Only messages appended since the previous save are serialized here;
+        ``Checkpoint.create`` runs in a worker thread. Most saves are handed to
+        a background task, and saves requested while a write is in flight are
+        coalesced: only the most recent snapshot is written, so the id of a
+        superseded save never reaches storage. Saves with a trigger in
+        ``_CKPT_DURABLE_TRIGGERS`` (``user_input_wait``, whose id is used to
+        resume) are never coalesced; they are written before this returns and
+        storage errors propagate. ``flush_checkpoints`` waits for background
+        writes, re-raises the last one that failed, and is awaited before a
+        run returns (see ``_close_checkpoints`` for runs that exit with an
+        exception).
+
+        Returns:
+            The checkpoint id, or None when checkpointing is disabled
+        """
         if not self.checkpoint_enabled:
             return None
 
         config = self._config.checkpoint
         assert config is not None
+
+        # Mint the thread id once so later saves reuse it instead of calling
+        # uuid4() per step (and landing in a fresh thread every time).
+        if state.thread_id is None:
+            state.thread_id = str(uuid4())
+
+        checkpoint_id = Checkpoint.new_id()
+        snapshot: dict[str, Any] = {
+            "checkpoint_id": checkpoint_id,
+            "agent_id": self._agent_id,
+            "thread_id": state.thread_id,
+            "step": state.current_step,
+            "status": state.status.value,
+            "messages": self._serialize_history(state.messages),
+            "pending_tool_calls": pending_tool_calls,
+            "input_tokens": state.total_input_tokens,
+            "output_tokens": state.total_output_tokens,
+            "metadata": {"trigger": trigger},
+            "parent_id": state.last_checkpoint_id,
+        }
+        state.last_checkpoint_id = checkpoint_id
+
+        if trigger in _CKPT_DURABLE_TRIGGERS:
+            # Queued snapshots are older; let them land first to keep the chain ordered
+            if self._ckpt_task is not None:
+                await self._ckpt_task
+            await self._write_checkpoint(config, snapshot)
+            return checkpoint_id
+
+        if self._ckpt_pending is not None:
+            # The queued snapshot is superseded; link past it
+            snapshot["parent_id"] = self._ckpt_pending["parent_id"]
+        self._ckpt_pending = snapshot
+
+        if self._ckpt_task is None or self._ckpt_task.done():
+            self._ckpt_task = asyncio.create_task(self._write_checkpoints(config))
+
+        return checkpoint_id
+
+    def _serialize_history(self, messages: list[Message]) -> list[dict[str, Any]]:
+        """Serialize ``messages`` for a checkpoint, reusing the previous save's prefix.
+
+        History is append-only between saves, so only messages added since
+        the last checkpoint are serialized. The cache restarts when the list
+        is replaced, shrinks, or no longer holds the same message at the end
+        of the cached prefix.
+
+        Args:
+            messages: Current message history
+
+        Returns:
+            A new list of serialized messages (entries are shared, not copied)
+        """
+        done = self._ckpt_messages
+        count = len(done)
+        if (
+            messages is not self._ckpt_source
+            or len(messages) < count
+            or (count and messages[count - 1] is not self._ckpt_last_message)
+        ):
+            self._ckpt_source = messages
+            done.clear()
+            count = 0
+        serialize = Checkpoint.serialize_message
+        done.extend(serialize(msg) for msg in messages[count:])
+        self._ckpt_last_message = messages[-1] if messages else None
+        return list(done)
+
+    async def _write_checkpoints(self, config: CheckpointConfig) -> None:
+        while self._ckpt_pending is not None:
+            snapshot = self._ckpt_pending
+            self._ckpt_pending = None
+            try:
+                await self._write_checkpoint(config, snapshot)
+            except Exception as e:
+                logger.exception("Failed to save checkpoint %s", snapshot["checkpoint_id"])
+                self._ckpt_error = e
+
+    async def _write_checkpoint(self, config: CheckpointConfig, snapshot: dict[str, Any]) -> None:
+        checkpoint = await asyncio.to_thread(Checkpoint.create, **snapshot)
+        await config.get_storage().save(checkpoint)
+
+        self._ckpt_thread_id = checkpoint.thread_id
+        self._ckpt_unpruned += 1
+        if self._ckpt_unpruned >= _CKPT_PRUNE_INTERVAL:
+            # The checkpoint is saved; a failed prune is retried on the next pass
+            try:
+                await self._prune_checkpoints(config)
+            except Exception:
+                logger.exception("Failed to prune checkpoints for thread %s", self._ckpt_thread_id)
+
+    async def _prune_checkpoints(self, config: CheckpointConfig) -> None:
+        """Trim the current thread to ``max_checkpoints_per_thread`` checkpoints.
+
+        Runs every ``_CKPT_PRUNE_INTERVAL`` writes and once more on flush, so
+        a thread may briefly hold a few extra checkpoints mid-run.
+        """
+        self._ckpt_unpruned = 0
+        keep = config.max_checkpoints_per_thread
+        if keep <= 0 or self._ckpt_thread_id is None:
+            return
+
         storage = config.get_storage()
+        delete_older_than = getattr(storage, "delete_older_than", None)
+        if delete_older_than is not None:
+            await delete_older_than(self._ckpt_thread_id, keep)
+            return
 
-        checkpoint = Checkpoint.create(
-            agent_id=self._agent_id,
-            thread_id=state.thread_id or str(uuid4()),
-            step=state.current_step,
-            status=state.status.value,
-            messages=state.messages,
-            pending_tool_calls=pending_tool_calls,
-            input_tokens=state.total_input_tokens,
-            output_tokens=state.total_output_tokens,
-            metadata={"trigger": trigger},
-            parent_id=state.last_checkpoint_id,
+        existing = await storage.list_checkpoints(
+            self._ckpt_thread_id, limit=keep + _CKPT_PRUNE_INTERVAL
         )
+        await asyncio.gather(*(storage.delete(old_cp.id) for old_cp in existing[keep:]))
 
-        await storage.save(checkpoint)
-        state.last_checkpoint_id = checkpoint.id
+    async def flush_checkpoints(self) -> None:
+        """Wait until queued checkpoint writes have reached storage.
 
-        if config.max_checkpoints_per_thread > 0:
-            existing = await storage.list_checkpoints(
-                checkpoint.thread_id,
-                limit=config.max_checkpoints_per_thread + 10,
-            )
-            if len(existing) > config.max_checkpoints_per_thread:
-                for old_cp in existing[config.max_checkpoints_per_thread:]:
-                    await storage.delete(old_cp.id)
+        Raises:
+            Exception: The last error from a background checkpoint write
+        """
+        if self._ckpt_task is not None:
+            await self._ckpt_task
+        error, self._ckpt_error = self._ckpt_error, None
+        if error is not None:
+            raise error
+        if self._ckpt_unpruned:
+            config = self._config.checkpoint
+            if config is None or config.storage is None:
+                return
+            try:
+                await self._prune_checkpoints(config)
+            except Exception:
+                logger.exception("Failed to prune checkpoints for thread %s", self._ckpt_thread_id)
 
-        return checkpoint.id
+    async def _close_checkpoints(self, unwinding: Optional[BaseException]) -> None:
+        """Flush checkpoint writes as a run exits.
+
+        A write error is raised only when the run is exiting normally. While
+        another exception is unwinding it is logged instead, so it never
+        replaces the original error. On cancellation the queued writes are
+        not awaited; they finish in the background and the next flush
+        waits for them.
+
+        Args:
+            unwinding: Exception the run is exiting with, if any
+        """
+        if unwinding is None:
+            await self.flush_checkpoints()
+            return
+        if isinstance(unwinding, asyncio.CancelledError):
+            return
+        try:
+            await self.flush_checkpoints()
+        except Exception:
+            logger.exception("Checkpoint write failed while the run was exiting with an error")
 
     def set_tools(self, tools: dict[str, Tool]) -> None:
         self._tool_executor.set_tools(tools)
-        self._tool_schemas = [tool.to_schema() for tool in tools.values()]
+        # Key-sorted schemas serialize byte-identically on every request,
+        # keeping the tools block of the prompt prefix cacheable.
+        tools_json = json.dumps(
+            [tool.to_schema() for tool in tools.values()],
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        self._tool_schemas = json.loads(tools_json)
+        # Response cache keys start from this pre-fed hash instead of
+        # re-serializing the schemas on every request
+        self._tools_digest = hashlib.blake2b(tools_json.encode("utf-8"), digest_size=16)
 
     def get_tool_schemas(self) -> list[dict[str, Any]]:
         if self._tool_schemas is None:
@@ -405,248 +913,488 @@ class AgentLoop:
     def hooks(self) -> HookManager:
         return self._hooks
 
-    async def run(self, state: AgentState, metadata: Optional[dict[str, Any]] = None) -> str:
-        state.reset_for_run()
-        state.max_steps = self._config.max_steps
+    def _response_cache_key(self, messages: list[Message]) -> bytes:
+        """Hash the canonicalized (model, tools, messages) request.
+
+        The tools part comes from the digest seeded once in ``set_tools``.
+        Hash states are kept per message, so only messages that are not part
+        of the previous request's prefix (compared by identity) are
+        serialized; messages are assumed not to be mutated once sent.
+        """
+        model = getattr(self._llm, "model", "")
+        base = (self._tools_digest, model)
+        done = self._key_messages
+        states = self._key_states
+        if self._key_base[0] is not base[0] or self._key_base[1] != model or not states:
+            seed = self._tools_digest.copy()
+            seed.update(json.dumps(model, ensure_ascii=False).encode("utf-8"))
+            self._key_base = base
+            done.clear()
+            states[:] = [seed]
+
+        count = 0
+        limit = min(len(done), len(messages))
+        while count < limit and done[count] is messages[count]:
+            count += 1
+        del done[count:]
+        del states[count + 1:]
+
+        for message in messages[count:]:
+            digest = states[-1].copy()
+            digest.update(json.dumps(
+                message.model_dump(mode="json"),
+                sort_keys=True,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ).encode("utf-8"))
+            done.append(message)
+            states.append(digest)
+        return states[-1].digest()
+
+    def _fit_tail_budget(self, messages: list[Message]) -> tuple[list[Message], int]:
+        """Drop the oldest non-system messages until the tail fits the budget.
+
+        The system prompt and the latest message are always kept, and the
+        kept tail always starts with a user message, so it never opens with an
+        assistant turn or an orphaned tool result. A cut that lands elsewhere
+        moves forward to the next user message, or back to the previous one
+        (overshooting the budget) when no user message follows. The history
+        in ``state.messages`` is not modified.
+
+        Args:
+            messages: Full message history
+
+        Returns:
+            (messages to send, number of dropped messages)
+        """
+        budget = self._config.tail_token_budget
+        if budget <= 0 or not messages:
+            return messages, 0
+
+        prefix_len = 1 if messages[0].role == "system" else 0
+        estimate = self._token_manager.estimate_message_tokens
+        start = len(messages)
+        used = 0
+        while start > prefix_len:
+            cost = estimate(messages[start - 1])
+            if used + cost > budget and start < len(messages):
+                break
+            used += cost
+            start -= 1
+        if start < len(messages) and messages[start].role != "user":
+            following = next(
+                (i for i in range(start + 1, len(messages)) if messages[i].role == "user"),
+                None,
+            )
+            if following is not None:
+                start = following
+            else:
+                while start > prefix_len and messages[start].role != "user":
+                    start -= 1
+
+        dropped = start - prefix_len
+        if dropped == 0:
+            return messages, 0
+        return messages[:prefix_len] + messages[start:], dropped
+
+    async def _request_messages(self, state: AgentState) -> list[Message]:
+        """Messages to send for this step, with the tail budget applied."""
+        request_messages, dropped = self._fit_tail_budget(state.messages)
+        if dropped and self._events.has_listeners(EventType.TOKEN_SUMMARY):
+            await self._events.emit(AgentEvent(
+                type=EventType.TOKEN_SUMMARY,
+                step=state.current_step,
+                data={
+                    "dropped_messages": dropped,
+                    "tail_token_budget": self._config.tail_token_budget,
+                },
+            ))
+        return request_messages
 
-        ctx = HookContext(state=state, step=0)
-        await self._hooks.trigger_before_run(ctx)
+    def clear_response_cache(self) -> None:
+        self._response_cache.clear()
 
-        while state.current_step < self._config.max_steps:
-            state.increment_step()
-            ctx.step = state.current_step
+    def _request_metadata(self, metadata: Optional[dict[str, Any]]) -> dict[str, Any]:
+        """Attach a stable prompt cache key to the per-run LLM metadata.
 
-            result = await self._execute_step(state, metadata)
+        The key is derived from the agent id so every step of this agent
+        routes to the same provider-side prefix cache. ``LLMClient`` sends it
+        as the ``prompt_cache_key`` request parameter for OpenAI models and
+        drops it for providers that do not accept one.
+        """
+        return {"prompt_cache_key": self._agent_id, **(metadata or {})}
 
-            step_data = {"completed": result.completed, "content": result.content, "error": result.error}
-            await self._hooks.trigger_on_step(ctx, step_data)
+    async def run(self, state: AgentState, metadata: Optional[dict[str, Any]] = None) -> str:
+        unwinding: Optional[BaseException] = None
+        try:
+            state.reset_for_run()
+            state.max_steps = self._config.max_steps
+            metadata = self._request_metadata(metadata)
 
-            if result.completed:
-                state.mark_completed()
-                await self._events.emit(AgentEvent(
-                    type=EventType.COMPLETION,
-                    step=state.current_step,
-                    data={
-                        "message": result.content,
-                        "total_steps": state.current_step,
-                        "total_input_tokens": state.total_input_tokens,
-                        "total_output_tokens": state.total_output_tokens,
-                    },
-                ))
-                await self._hooks.trigger_after_run(ctx, result.content, True)
-                return result.content
+            ctx = HookContext(state=state, step=0)
+            await self._hooks.trigger_before_run(ctx)
+
+            while state.current_step < self._config.max_steps:
+                state.increment_step()
+                ctx.step = state.current_step
+
+                result = await self._execute_step(state, metadata)
 
-            if result.waiting_input:
-                await self._hooks.trigger_after_run(ctx, "Waiting for user input", True)
-                return "Waiting for user input"
+                if self._hooks.has_step_hooks:
+                    step_data = {"completed": result.completed, "content": result.content, "error": result.error}
+                    await self._hooks.trigger_on_step(ctx, step_data)
 
-            if result.error:
-                state.mark_error(result.error)
+                if result.completed:
+                    state.mark_completed()
+                    if self._events.has_listeners(EventType.COMPLETION):
+                        await self._events.emit(AgentEvent(
+                            type=EventType.COMPLETION,
+                            step=state.current_step,
+                            data={
+                                "message": result.content,
+                                "total_steps": state.current_step,
+                                "total_input_tokens": state.total_input_tokens,
+                                "total_output_tokens": state.total_output_tokens,
+                            },
+                        ))
+                    await self._hooks.trigger_after_run(ctx, result.content, True)
+                    return result.content
+
+                if result.waiting_input:
+                    await self._hooks.trigger_after_run(ctx, "Waiting for user input", True)
+                    return "Waiting for user input"
+
+                if result.error:
+                    state.mark_error(result.error)
+                    self.clear_response_cache()
+                    if self._events.has_listeners(EventType.ERROR):
+                        await self._events.emit(AgentEvent(
+                            type=EventType.ERROR,
+                            step=state.current_step,
+                            data={"message": result.error},
+                        ))
+                    await self._hooks.trigger_after_run(ctx, result.error, False)
+                    return result.error
+
+            error_msg = f"Task couldn't be completed after {self._config.max_steps} steps."
+            state.mark_error(error_msg)
+            if self._events.has_listeners(EventType.ERROR):
                 await self._events.emit(AgentEvent(
                     type=EventType.ERROR,
                     step=state.current_step,
-                    data={"message": result.error},
+                    data={"message": error_msg, "reason": "max_steps_reached"},
                 ))
-                await self._hooks.trigger_after_run(ctx, result.error, False)
-                return result.error
-
-        error_msg = f"Task couldn't be completed after {self._config.max_steps} steps."
-        state.mark_error(error_msg)
-        await self._events.emit(AgentEvent(
-            type=EventType.ERROR,
-            step=state.current_step,
-            data={"message": error_msg, "reason": "max_steps_reached"},
-        ))
-        await self._hooks.trigger_after_run(ctx, error_msg, False)
-        return error_msg
+            await self._hooks.trigger_after_run(ctx, error_msg, False)
+            return error_msg
+        except BaseException as exc:
+            unwinding = exc
+            raise
+        finally:
+            await self._close_checkpoints(unwinding)
 
     async def run_stream(
         self,
         state: AgentState,
         metadata: Optional[dict[str, Any]] = None,
     ) -> AsyncIterator[dict[str, Any]]:
-        state.reset_for_run()
-        state.max_steps = self._config.max_steps
+        unwinding: Optional[BaseException] = None
+        try:
+            state.reset_for_run()
+            state.max_steps = self._config.max_steps
+            metadata = self._request_metadata(metadata)
+
+            ctx = HookContext(state=state, step=0)
+            await self._hooks.trigger_before_run(ctx)
+
+            while state.current_step < self._config.max_steps:
+                state.increment_step()
+                ctx.step = state.current_step
+
+                waiting_input = False
+                async with aclosing(_buffered(self._execute_step_stream(state, metadata))) as events:
+                    async for event in events:
+                        yield event
+
+                        event_type = event["type"]
+                        if event_type not in _TERMINAL_STREAM_EVENTS:
+                            continue
+                        if event_type == "done":
+                            state.mark_completed()
+                            await self._hooks.trigger_after_run(ctx, event["data"].get("message", ""), True)
+                            return
+                        elif event_type == "user_input_required":
+                            # Drain the step so its user_input_wait checkpoint is saved
+                            waiting_input = True
+                        else:
+                            state.mark_error(event["data"].get("message", "Unknown error"))
+                            await self._hooks.trigger_after_run(ctx, event["data"].get("message", ""), False)
+                            return
+
+                if waiting_input:
+                    await self._hooks.trigger_after_run(ctx, "Waiting for user input", True)
+                    return
 
-        ctx = HookContext(state=state, step=0)
-        await self._hooks.trigger_before_run(ctx)
+            error_msg = f"Task couldn't be completed after {self._config.max_steps} steps."
+            await self._hooks.trigger_after_run(ctx, error_msg, False)
+            yield {
+                "type": "error",
+                "data": {"message": error_msg, "reason": "max_steps_reached"},
+            }
+        except BaseException as exc:
+            unwinding = exc
+            raise
+        finally:
+            await self._close_checkpoints(unwinding)
+
+    @staticmethod
+    def _build_user_input_request(tool_call: ToolCall) -> tuple[UserInputRequest, list[dict[str, Any]]]:
+        """Build the pending request for a get_user_input call.
+
+        The fields returned by ``parse_user_input_fields`` are fresh, validated
+        models; pydantic keeps model instances as-is, so constructing the
+        request only validates the LLM-supplied ``context``. The event payload
+        is read straight from the field attributes instead of a
+        ``model_dump`` per field.
 
-        while state.current_step < self._config.max_steps:
-            state.increment_step()
-            ctx.step = state.current_step
+        Args:
+            tool_call: The get_user_input tool call
 
-            async for event in self._execute_step_stream(state, metadata):
-                yield event
+        Returns:
+            (request, field dicts for the event payload)
+        """
+        arguments = tool_call.function.arguments
+        fields = parse_user_input_fields(arguments)
+        request = UserInputRequest(
+            tool_call_id=tool_call.id,
+            fields=fields,
+            context=arguments.get("context"),
+        )
+        field_dumps = [
+            {
+                "field_name": f.field_name,
+                "field_type": f.field_type,
+                "field_description": f.field_description,
+                "value": f.value,
+            }
+            for f in fields
+        ]
+        return request, field_dumps
 
-                if event["type"] == "done":
-                    state.mark_completed()
-                    await self._hooks.trigger_after_run(ctx, event["data"].get("message", ""), True)
-                    return
+    async def _maybe_summarize(self, state: AgentState) -> int:
+        """Summarize history only when the cheap trigger check passes.
 
-                if event["type"] == "user_input_required":
-                    await self._hooks.trigger_after_run(ctx, "Waiting for user input", True)
-                    return
+        Returns:
+            Token count of the history before summarization
+        """
+        estimate = self._token_manager.estimate_message_tokens
+        if state.uncounted_messages() > _TOKEN_OFFLOAD_THRESHOLD:
+            # Full recount after resume or summarization: keep tokenization
+            # off the event loop
+            token_count = await asyncio.to_thread(state.sync_token_count, estimate)
+        else:
+            token_count = state.sync_token_count(estimate)
+        if self._token_manager.should_summarize(state.messages, token_count):
+            state.messages = await self._token_manager.maybe_summarize_messages(
+                state.messages, estimated_tokens=token_count
+            )
+        return token_count
 
-                if event["type"] == "error":
-                    state.mark_error(event["data"].get("message", "Unknown error"))
-                    await self._hooks.trigger_after_run(ctx, event["data"].get("message", ""), False)
-                    return
+    async def _iter_tool_results(
+        self,
+        tool_calls: list[ToolCall],
+    ) -> AsyncIterator[ToolExecutionResult]:
+        """Execute tool calls, yielding results in call order.
 
-        error_msg = f"Task couldn't be completed after {self._config.max_steps} steps."
-        await self._hooks.trigger_after_run(ctx, error_msg, False)
-        yield {
-            "type": "error",
-            "data": {"message": error_msg, "reason": "max_steps_reached"},
-        }
+        With ``parallel_tools`` all calls start concurrently, so it should only
+        be enabled for toolsets whose calls do not depend on each other (e.g.
+        read-only lookups; not a write_file followed by bash running it).
+        Otherwise the calls run one by one.
+
+        Args:
+            tool_calls: Tool calls from the assistant message
+
+        Yields:
+            Result of each call, in the order of ``tool_calls``
+        """
+        execute = self._tool_executor.execute_single
+        if self._config.parallel_tools and len(tool_calls) > 1:
+            tasks = [
+                asyncio.ensure_future(execute(tc.id, tc.function.name, tc.function.arguments))
+                for tc in tool_calls
+            ]
+            try:
+                for task in tasks:
+                    yield await task
+            finally:
+                # The consumer stopped early; don't leave calls running unobserved
+                for task in tasks:
+                    task.cancel()
+            return
+
+        for tool_call in tool_calls:
+            function = tool_call.function
+            yield await execute(tool_call.id, function.name, function.arguments)
 
     async def _execute_step(
         self,
         state: AgentState,
         metadata: Optional[dict[str, Any]],
     ) -> StepResult:
-        current_tokens = self._token_manager.estimate_tokens(state.messages)
-        state.messages = await self._token_manager.maybe_summarize_messages(state.messages)
-
-        await self._events.emit(AgentEvent(
-            type=EventType.STEP_START,
-            step=state.current_step,
-            data={
-                "tokens": current_tokens,
-                "token_limit": self._token_manager.token_limit,
-                "max_steps": self._config.max_steps,
-            },
-        ))
+        current_tokens = await self._maybe_summarize(state)
 
-        try:
-            response = await self._llm.generate(
-                messages=state.messages,
-                tools=self._tool_schemas,
-                metadata=metadata,
-            )
-        except Exception as e:
-            return StepResult(error=f"LLM call failed: {str(e)}")
-
-        if response.usage:
-            state.add_tokens(response.usage.input_tokens, response.usage.output_tokens)
-
-        await self._events.emit(AgentEvent(
-            type=EventType.LLM_RESPONSE,
-            step=state.current_step,
-            data={
-                "content": response.content,
-                "thinking": response.thinking,
-                "has_tool_calls": bool(response.tool_calls),
-                "tool_count": len(response.tool_calls) if response.tool_calls else 0,
-                "input_tokens": response.usage.input_tokens if response.usage else 0,
-                "output_tokens": response.usage.output_tokens if response.usage else 0,
-            },
-        ))
+        if self._events.has_listeners(EventType.STEP_START):
+            await self._events.emit(AgentEvent(
+                type=EventType.STEP_START,
+                step=state.current_step,
+                data={
+                    "tokens": current_tokens,
+                    "token_limit": self._token_manager.token_limit,
+                    "max_steps": self._config.max_steps,
+                },
+            ))
 
-        assistant_msg = Message(
-            role="assistant",
-            content=response.content,
-            thinking=response.thinking,
-            tool_calls=response.tool_calls,
-        )
-        state.messages.append(assistant_msg)
+        request_messages = await self._request_messages(state)
+
+        cache_size = self._config.response_cache_size
+        cache_key: Optional[bytes] = None
+        response: Optional[LLMResponse] = None
+        if cache_size > 0:
+            cache_key = self._response_cache_key(request_messages)
+            response = self._response_cache.get(cache_key)
+            if response is not None:
+                self._response_cache.move_to_end(cache_key)
+        cached = response is not None
+
+        if response is None:
+            try:
+                response = await self._llm.generate(
+                    messages=request_messages,
+                    tools=self._tool_schemas,
+                    metadata=metadata,
+                )
+            except Exception as e:
+                return StepResult(error=f"LLM call failed: {str(e)}")
+
+            # Replaying tool calls would re-run side-effecting tools and reuse
+            # tool_call ids, so only final answers are cached
+            if cache_key is not None and not response.tool_calls:
+                self._response_cache[cache_key] = response
+                if len(self._response_cache) > cache_size:
+                    self._response_cache.popitem(last=False)
+
+            if response.usage:
+                state.add_tokens(response.usage.input_tokens, response.usage.output_tokens)
+
+        usage = None if cached else response.usage
+        tool_calls = response.tool_calls
+        if self._events.has_listeners(EventType.LLM_RESPONSE):
+            await self._events.emit(AgentEvent(
+                type=EventType.LLM_RESPONSE,
+                step=state.current_step,
+                data={
+                    "content": response.content,
+                    "thinking": response.thinking,
+                    "has_tool_calls": bool(tool_calls),
+                    "tool_count": len(tool_calls) if tool_calls else 0,
+                    "input_tokens": usage.input_tokens if usage else 0,
+                    "output_tokens": usage.output_tokens if usage else 0,
+                    "cache_read_tokens": usage.cache_read_input_tokens if usage else 0,
+                    "cached": cached,
+                },
+            ))
 
-        if not response.tool_calls:
+        if not tool_calls:
+            state.messages.append(_assistant_text_message(response.content, response.thinking))
             return StepResult(completed=True, content=response.content)
 
-        for tool_call in response.tool_calls:
-            if is_user_input_tool_call(tool_call.function.name):
-                input_fields = parse_user_input_fields(tool_call.function.arguments)
-                request = UserInputRequest(
-                    tool_call_id=tool_call.id,
-                    fields=[
-                        UserInputField(
-                            field_name=f.field_name,
-                            field_type=f.field_type,
-                            field_description=f.field_description,
-                        )
-                        for f in input_fields
-                    ],
-                    context=tool_call.function.arguments.get("context"),
-                )
-                state.mark_waiting_input(request, tool_call.id)
+        state.messages.append(
+            _assistant_tool_message(response.content, response.thinking, tool_calls)
+        )
 
+        tool_call = _find_user_input_call(tool_calls)
+        if tool_call is not None:
+            request, field_dumps = self._build_user_input_request(tool_call)
+            state.mark_waiting_input(request, tool_call.id)
+
+            if self._events.has_listeners(EventType.USER_INPUT_REQUIRED):
                 await self._events.emit(AgentEvent(
                     type=EventType.USER_INPUT_REQUIRED,
                     step=state.current_step,
                     data={
                         "tool_call_id": tool_call.id,
-                        "fields": [f.model_dump() for f in input_fields],
-                        "context": tool_call.function.arguments.get("context"),
+                        "fields": field_dumps,
+                        "context": request.context,
                     },
                 ))
 
-                ckpt_config = self._config.checkpoint
-                if self.checkpoint_enabled and ckpt_config and ckpt_config.save_on_user_input:
-                    await self._save_checkpoint(
-                        state,
-                        trigger="user_input_wait",
-                        pending_tool_calls=[tool_call],
-                    )
-
-                return StepResult(waiting_input=True)
-
-        tool_calls_data = [
-            (tc.id, tc.function.name, tc.function.arguments)
-            for tc in response.tool_calls
-        ]
-
-        for call_id, name, args in tool_calls_data:
-            await self._events.emit(AgentEvent(
-                type=EventType.TOOL_START,
-                step=state.current_step,
-                data={"tool": name, "arguments": args, "tool_call_id": call_id},
-            ))
+            ckpt_config = self._config.checkpoint
+            if ckpt_config is not None and ckpt_config.save_on_user_input and self.checkpoint_enabled:
+                await self._save_checkpoint(
+                    state,
+                    trigger="user_input_wait",
+                    pending_tool_calls=[tool_call],
+                )
 
-        results = await self._tool_executor.execute_batch(tool_calls_data)
+            return StepResult(waiting_input=True)
+
+        if self._events.has_listeners(EventType.TOOL_START):
+            async with self._events.batch():
+                for tool_call in tool_calls:
+                    await self._events.emit(AgentEvent(
+                        type=EventType.TOOL_START,
+                        step=state.current_step,
+                        data={
+                            "tool": tool_call.function.name,
+                            "arguments": tool_call.function.arguments,
+                            "tool_call_id": tool_call.id,
+                        },
+                    ))
+
+        results: list[ToolExecutionResult] = []
+        async for exec_result in self._iter_tool_results(tool_calls):
+            results.append(exec_result)
+            if self._events.has_listeners(EventType.TOOL_END):
+                result = exec_result.result
+                success = result.success
+                await self._events.emit(AgentEvent(
+                    type=EventType.TOOL_END,
+                    step=state.current_step,
+                    data={
+                        "tool": exec_result.tool_name,
+                        "tool_call_id": exec_result.tool_call_id,
+                        "success": success,
+                        "content": result.content if success else None,
+                        "error": None if success else result.error,
+                        "execution_time": exec_result.execution_time,
+                    },
+                ))
 
         for exec_result in results:
-            await self._events.emit(AgentEvent(
-                type=EventType.TOOL_END,
-                step=state.current_step,
-                data={
-                    "tool": exec_result.tool_name,
-                    "tool_call_id": exec_result.tool_call_id,
-                    "success": exec_result.result.success,
-                    "content": exec_result.result.content if exec_result.result.success else None,
-                    "error": exec_result.result.error if not exec_result.result.success else None,
-                    "execution_time": exec_result.execution_time,
-                },
-            ))
-
-            tool_content = (
-                exec_result.result.content
-                if exec_result.result.success
-                else f"Error: {exec_result.result.error}"
-            )
-            state.messages.append(Message(
-                role="tool",
-                content=tool_content,
-                tool_call_id=exec_result.tool_call_id,
-                name=exec_result.tool_name,
+            result = exec_result.result
+            tool_content = result.content if result.success else f"Error: {result.error}"
+            state.messages.append(_tool_message(
+                tool_content,
+                exec_result.tool_call_id,
+                exec_result.tool_name,
             ))
 
             if self._config.on_tool_result:
-                tool_args = tool_calls_data[[r.tool_call_id for r in results].index(exec_result.tool_call_id)][2]
                 await self._config.on_tool_result(
                     exec_result.tool_call_id,
                     exec_result.tool_name,
-                    tool_args,
+                    exec_result.arguments,
                     tool_content,
                 )
 
-        await self._events.emit(AgentEvent(
-            type=EventType.STEP_END,
-            step=state.current_step,
-            data={"tools_executed": len(results)},
-        ))
+        if self._events.has_listeners(EventType.STEP_END):
+            await self._events.emit(AgentEvent(
+                type=EventType.STEP_END,
+                step=state.current_step,
+                data={"tools_executed": len(results)},
+            ))
 
         ckpt_config = self._config.checkpoint
-        if self.checkpoint_enabled and ckpt_config and ckpt_config.save_on_tool_execution:
+        if ckpt_config is not None and ckpt_config.save_on_tool_execution and self.checkpoint_enabled:
             await self._save_checkpoint(state, trigger="tool_execution")
 
         return StepResult()
@@ -656,8 +1404,7 @@ class AgentLoop:
         state: AgentState,
         metadata: Optional[dict[str, Any]],
     ) -> AsyncIterator[dict[str, Any]]:
-        current_tokens = self._token_manager.estimate_tokens(state.messages)
-        state.messages = await self._token_manager.maybe_summarize_messages(state.messages)
+        current_tokens = await self._maybe_summarize(state)
 
         yield {
             "type": "step",
@@ -669,30 +1416,50 @@ class AgentLoop:
             },
         }
 
-        thinking_buffer = ""
-        content_buffer = ""
+        request_messages = await self._request_messages(state)
+
+        # Deltas are collected and joined once, not concatenated per chunk
+        thinking_parts: list[str] = []
+        content_parts: list[str] = []
         tool_calls_buffer = []
+        coalescer = (
+            DeltaCoalescer(self._config.stream_coalesce_chars)
+            if self._config.stream_coalesce_chars > 0
+            else None
+        )
 
         try:
             async for event in self._llm.generate_stream(
-                messages=state.messages,
+                messages=request_messages,
                 tools=self._tool_schemas,
                 metadata=metadata,
             ):
                 event_type = event.get("type")
 
-                if event_type == "thinking_delta":
+                # Content deltas dominate the stream, so test them first
+                if event_type == "content_delta":
                     delta = event.get("delta", "")
-                    thinking_buffer += delta
-                    yield {"type": "thinking", "data": {"delta": delta}}
-
-                elif event_type == "content_delta":
+                    content_parts.append(delta)
+                    if coalescer is None:
+                        yield {"type": "content", "data": {"delta": delta}}
+                    else:
+                        for kind, text in coalescer.add("content", delta):
+                            yield {"type": kind, "data": {"delta": text}}
+
+                elif event_type == "thinking_delta":
                     delta = event.get("delta", "")
-                    content_buffer += delta
-                    yield {"type": "content", "data": {"delta": delta}}
+                    thinking_parts.append(delta)
+                    if coalescer is None:
+                        yield {"type": "thinking", "data": {"delta": delta}}
+                    else:
+                        for kind, text in coalescer.add("thinking", delta):
+                            yield {"type": kind, "data": {"delta": text}}
 
                 elif event_type == "tool_use":
                     tool_call = event.get("tool_call")
+                    if coalescer is not None:
+                        for kind, text in coalescer.flush():
+                            yield {"type": kind, "data": {"delta": text}}
                     if tool_call:
                         tool_calls_buffer.append(tool_call)
                         yield {
@@ -709,102 +1476,88 @@ class AgentLoop:
                         state.add_tokens(response.usage.input_tokens, response.usage.output_tokens)
                     break
 
+            if coalescer is not None:
+                for kind, text in coalescer.flush():
+                    yield {"type": kind, "data": {"delta": text}}
+
         except Exception as e:
             yield {"type": "error", "data": {"message": f"LLM call failed: {str(e)}"}}
             return
 
-        assistant_msg = Message(
-            role="assistant",
-            content=content_buffer,
-            thinking=thinking_buffer if thinking_buffer else None,
-            tool_calls=tool_calls_buffer if tool_calls_buffer else None,
-        )
-        state.messages.append(assistant_msg)
-
+        content_buffer = "".join(content_parts)
+        thinking_buffer = "".join(thinking_parts)
         if not tool_calls_buffer:
+            state.messages.append(_assistant_text_message(content_buffer, thinking_buffer or None))
             yield {
                 "type": "done",
                 "data": {"message": content_buffer, "steps": state.current_step, "reason": "completed"},
             }
             return
 
-        for tool_call in tool_calls_buffer:
-            if is_user_input_tool_call(tool_call.function.name):
-                input_fields = parse_user_input_fields(tool_call.function.arguments)
-                request = UserInputRequest(
-                    tool_call_id=tool_call.id,
-                    fields=[
-                        UserInputField(
-                            field_name=f.field_name,
-                            field_type=f.field_type,
-                            field_description=f.field_description,
-                        )
-                        for f in input_fields
-                    ],
-                    context=tool_call.function.arguments.get("context"),
-                )
-                state.mark_waiting_input(request, tool_call.id)
+        state.messages.append(
+            _assistant_tool_message(content_buffer, thinking_buffer or None, tool_calls_buffer)
+        )
 
-                yield {
-                    "type": "user_input_required",
-                    "data": {
-                        "tool_call_id": tool_call.id,
-                        "fields": [f.model_dump() for f in input_fields],
-                        "context": tool_call.function.arguments.get("context"),
-                    },
-                }
+        tool_call = _find_user_input_call(tool_calls_buffer)
+        if tool_call is not None:
+            request, field_dumps = self._build_user_input_request(tool_call)
+            state.mark_waiting_input(request, tool_call.id)
 
-                ckpt_config = self._config.checkpoint
-                if self.checkpoint_enabled and ckpt_config and ckpt_config.save_on_user_input:
-                    await self._save_checkpoint(
-                        state,
-                        trigger="user_input_wait",
-                        pending_tool_calls=[tool_call],
-                    )
+            yield {
+                "type": "user_input_required",
+                "data": {
+                    "tool_call_id": tool_call.id,
+                    "fields": field_dumps,
+                    "context": request.context,
+                },
+            }
 
-                return
+            ckpt_config = self._config.checkpoint
+            if ckpt_config is not None and ckpt_config.save_on_user_input and self.checkpoint_enabled:
+                await self._save_checkpoint(
+                    state,
+                    trigger="user_input_wait",
+                    pending_tool_calls=[tool_call],
+                )
 
-        tool_calls_data = [
-            (tc.id, tc.function.name, tc.function.arguments)
-            for tc in tool_calls_buffer
-        ]
-        results = await self._tool_executor.execute_batch(tool_calls_data)
+            return
 
-        for exec_result in results:
+        tool_calls = tool_calls_buffer
+        results: list[ToolExecutionResult] = []
+        async for exec_result in self._iter_tool_results(tool_calls):
+            results.append(exec_result)
+            result = exec_result.result
+            success = result.success
             yield {
                 "type": "tool_result",
                 "data": {
                     "tool": exec_result.tool_name,
-                    "success": exec_result.result.success,
-                    "content": exec_result.result.content if exec_result.result.success else None,
-                    "error": exec_result.result.error if not exec_result.result.success else None,
+                    "success": success,
+                    "content": result.content if success else None,
+                    "error": None if success else result.error,
                     "execution_time": exec_result.execution_time,
                 },
             }
 
-            tool_content = (
-                exec_result.result.content
-                if exec_result.result.success
-                else f"Error: {exec_result.result.error}"
-            )
-            state.messages.append(Message(
-                role="tool",
-                content=tool_content,
-                tool_call_id=exec_result.tool_call_id,
-                name=exec_result.tool_name,
+        for exec_result in results:
+            result = exec_result.result
+            tool_content = result.content if result.success else f"Error: {result.error}"
+            state.messages.append(_tool_message(
+                tool_content,
+                exec_result.tool_call_id,
+                exec_result.tool_name,
             ))
 
             if self._config.on_tool_result:
-                tool_args = tool_calls_data[[r.tool_call_id for r in results].index(exec_result.tool_call_id)][2]
                 await self._config.on_tool_result(
                     exec_result.tool_call_id,
                     exec_result.tool_name,
-                    tool_args,
+                    exec_result.arguments,
                     tool_content,
                 )
 
         ckpt_config = self._config.checkpoint
-        if self.checkpoint_enabled and ckpt_config and ckpt_config.save_on_tool_execution:
+        if ckpt_config is not None and ckpt_config.save_on_tool_execution and self.checkpoint_enabled:
             await self._save_checkpoint(state, trigger="tool_execution")
 
     async def resume_from_input(
@@ -849,12 +1602,20 @@ class AgentLoop:
         async for event in self.run_stream(state, metadata):
             yield event
 
-    async def resume_from_checkpoint(
+    async def _load_resume_state(
         self,
-        checkpoint_id: Optional[str] = None,
-        thread_id: Optional[str] = None,
-        metadata: Optional[dict[str, Any]] = None,
-    ) -> tuple[AgentState, str]:
+        checkpoint_id: Optional[str],
+        thread_id: Optional[str],
+    ) -> AgentState:
+        """Load the requested checkpoint and rebuild its agent state.
+
+        Args:
+            checkpoint_id: Checkpoint to load; takes precedence over thread_id.
+            thread_id: Thread whose latest checkpoint is loaded.
+
+        Returns:
+            The restored state, already switched back to running.
+        """
         if not self.checkpoint_enabled:
             raise RuntimeError("Checkpoint is not enabled")
 
@@ -873,6 +1634,15 @@ class AgentLoop:
 
         state = AgentState.from_checkpoint(checkpoint, max_steps=self._config.max_steps)
         state.resume_from_checkpoint()
+        return state
+
+    async def resume_from_checkpoint(
+        self,
+        checkpoint_id: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        metadata: Optional[dict[str, Any]] = None,
+    ) -> tuple[AgentState, str]:
+        state = await self._load_resume_state(checkpoint_id, thread_id)
 
         result = await self.run(state, metadata)
         return state, result
@@ -883,24 +1653,7 @@ class AgentLoop:
         thread_id: Optional[str] = None,
         metadata: Optional[dict[str, Any]] = None,
     ) -> tuple[AgentState, AsyncIterator[dict[str, Any]]]:
-        if not self.checkpoint_enabled:
-            raise RuntimeError("Checkpoint is not enabled")
-
-        config = self._config.checkpoint
-        assert config is not None
-        storage = config.get_storage()
-
-        checkpoint: Optional[Checkpoint] = None
-        if checkpoint_id:
-            checkpoint = await storage.load(checkpoint_id)
-        elif thread_id:
-            checkpoint = await storage.load_latest(thread_id)
-
-        if checkpoint is None:
-            raise ValueError(f"Checkpoint not found: checkpoint_id={checkpoint_id}, thread_id={thread_id}")
-
-        state = AgentState.from_checkpoint(checkpoint, max_steps=self._config.max_steps)
-        state.resume_from_checkpoint()
+        state = await self._load_resume_state(checkpoint_id, thread_id)
 
         async def stream_generator() -> AsyncIterator[dict[str, Any]]:
             async for event in self.run_stream(state, metadata):
@@ -909,6 +1662,29 @@ class AgentLoop:
         return state, stream_generator()
 
 
+# Ralph 模式系统提示模板，每次迭代只填充动态部分
+_RALPH_PROMPT_TEMPLATE = """{base_prompt}
+
+## Ralph Mode (Iteration {iteration})
+
+You are operating in Ralph iterative mode. Your task is:
+{task}
+
+### Working Memory
+{context_prefix}
+
+### Completion
+When you have completed the task, use the `signal_completion` tool or output:
+<promise>TASK COMPLETE</promise>
+
+### Guidelines
+- Review the working memory for context from previous iterations
+- Use `update_working_memory` to record progress and findings
+- Use `get_cached_result` to retrieve full tool outputs when summaries are insufficient
+- Focus on making incremental progress each iteration
+"""
+
+
 class Agent:
     """AI Agent 用户接口.
 
@@ -946,6 +1722,8 @@ class Agent:
         ralph: bool | RalphConfig = False,
         enable_memory: bool = False,
         memory_base_dir: str = "./.agent_memories",
+        max_execution_logs: Optional[int] = None,
+        log_sink: Optional[Callable[[dict[str, Any]], None]] = None,
     ) -> None:
         self.llm = llm_client
         self.name = name or "agent"
@@ -1010,7 +1788,21 @@ class Agent:
             self._loop.hooks.add(self._memory_hook)
 
         self.tracer: Optional[LangfuseTracer] = None
-        self.execution_logs: list[dict[str, Any]] = []
+        self._trace_open = False
+        self._continue_trace = False
+        # LiteLLM metadata for the open trace, computed once in _setup_tracer
+        self._llm_metadata: Optional[dict[str, Any]] = None
+        # Bounded when max_execution_logs is set so long runs keep only the newest records
+        self.max_execution_logs = max_execution_logs
+        self.execution_logs: deque[dict[str, Any]] = deque(maxlen=max_execution_logs)
+        # When set, records are handed to the sink as they happen instead of
+        # being kept in execution_logs (run() then returns an empty log list)
+        self.log_sink = log_sink
+        self._append_log: Callable[[dict[str, Any]], None] = log_sink or self.execution_logs.append
+        self._log_listeners_bound = False
+        self._history_source: Optional[list[Message]] = None
+        self._history_snapshot: Optional[tuple[Message, ...]] = None
+        self._ralph_tool_items: Optional[list[tuple[str, Tool]]] = None
 
         if prompt_config:
             self.system_prompt = self._build_structured_prompt(prompt_config)
@@ -1051,11 +1843,12 @@ class Agent:
         self._loop.hooks.remove(hook)
 
     def _collect_tool_instructions(self) -> list[str]:
-        instructions = []
-        for tool in self.tools.values():
-            if tool.add_instructions_to_prompt and tool.instructions:
-                instructions.append(tool.instructions)
-        return instructions
+        # Read each tool's instructions property once
+        return [
+            instructions
+            for tool in self.tools.values()
+            if tool.add_instructions_to_prompt and (instructions := tool.instructions)
+        ]
 
     def _build_structured_prompt(self, config: SystemPromptConfig) -> str:
         tool_instructions = self._collect_tool_instructions()
@@ -1082,122 +1875,149 @@ class Agent:
         self._state.messages.append(Message(role="user", content=content))
 
     def _setup_execution_logging(self) -> None:
-        self.execution_logs = []
-
-        async def collect_step_start(event: AgentEvent) -> None:
-            self.execution_logs.append({
-                "type": "step",
-                "step": event.step,
-                "max_steps": event.data.get("max_steps", self.max_steps),
-                "tokens": event.data.get("tokens", 0),
-                "token_limit": event.data.get("token_limit", self.token_manager.token_limit),
+        self.execution_logs = deque(maxlen=self.max_execution_logs)
+        self._append_log = self.log_sink or self.execution_logs.append
+        # The collectors are bound methods that read self._append_log /
+        # self.tracer at call time, so they only need registering once
+        if not self._log_listeners_bound:
+            self._events.clear()
+            self._events.on_many({
+                EventType.STEP_START: self._collect_step_start,
+                EventType.LLM_RESPONSE: self._collect_llm_response,
+                EventType.TOOL_START: self._collect_tool_start,
+                EventType.TOOL_END: self._collect_tool_end,
+                EventType.USER_INPUT_REQUIRED: self._collect_user_input,
+                EventType.COMPLETION: self._collect_completion,
+                EventType.ERROR: self._collect_error,
             })
-            if self.tracer:
-                self.tracer.log_step(
-                    step=event.step,
-                    max_steps=event.data.get("max_steps", self.max_steps),
-                    token_count=event.data.get("tokens", 0),
-                    token_limit=event.data.get("token_limit", self.token_manager.token_limit),
-                )
+            self._log_listeners_bound = True
+
+    async def _collect_step_start(self, event: AgentEvent) -> None:
+        data = event.data
+        max_steps = data.get("max_steps", self.max_steps)
+        tokens = data.get("tokens", 0)
+        token_limit = data.get("token_limit", self.token_manager.token_limit)
+        self._append_log({
+            "type": "step",
+            "step": event.step,
+            "max_steps": max_steps,
+            "tokens": tokens,
+            "token_limit": token_limit,
+        })
+        if self.tracer:
+            self.tracer.log_step(
+                step=event.step,
+                max_steps=max_steps,
+                token_count=tokens,
+                token_limit=token_limit,
+            )
 
-        async def collect_llm_response(event: AgentEvent) -> None:
-            self.execution_logs.append({
-                "type": "llm_response",
-                "thinking": event.data.get("thinking"),
-                "content": event.data.get("content"),
-                "has_tool_calls": event.data.get("has_tool_calls", False),
-                "tool_count": event.data.get("tool_count", 0),
-                "input_tokens": event.data.get("input_tokens", 0),
-                "output_tokens": event.data.get("output_tokens", 0),
-            })
-            if self.tracer and event.data.get("input_tokens"):
-                self.tracer.log_llm_response(
-                    input_tokens=event.data.get("input_tokens", 0),
-                    output_tokens=event.data.get("output_tokens", 0),
-                )
+    async def _collect_llm_response(self, event: AgentEvent) -> None:
+        data = event.data
+        input_tokens = data.get("input_tokens", 0)
+        output_tokens = data.get("output_tokens", 0)
+        self._append_log({
+            "type": "llm_response",
+            "thinking": data.get("thinking"),
+            "content": data.get("content"),
+            "has_tool_calls": data.get("has_tool_calls", False),
+            "tool_count": data.get("tool_count", 0),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_read_tokens": data.get("cache_read_tokens", 0),
+        })
+        if self.tracer and input_tokens:
+            self.tracer.log_llm_response(
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+            )
 
-        async def collect_tool_start(event: AgentEvent) -> None:
-            self.execution_logs.append({
-                "type": "tool_call",
-                "tool": event.data.get("tool"),
-                "arguments": event.data.get("arguments"),
-            })
+    async def _collect_tool_start(self, event: AgentEvent) -> None:
+        data = event.data
+        self._append_log({
+            "type": "tool_call",
+            "tool": data.get("tool"),
+            "arguments": data.get("arguments"),
+        })
 
-        async def collect_tool_end(event: AgentEvent) -> None:
-            if self.tracer:
-                pass
-            else:
-                self.execution_logs.append({
-                    "type": "tool_result",
-                    "tool": event.data.get("tool"),
-                    "success": event.data.get("success"),
-                    "content": event.data.get("content"),
-                    "error": event.data.get("error"),
-                    "execution_time": event.data.get("execution_time"),
-                })
-
-        async def collect_user_input(event: AgentEvent) -> None:
-            self.execution_logs.append({
-                "type": "user_input_required",
-                "tool_call_id": event.data.get("tool_call_id"),
-                "fields": event.data.get("fields"),
-                "context": event.data.get("context"),
-            })
+    async def _collect_tool_end(self, event: AgentEvent) -> None:
+        data = event.data
+        self._append_log({
+            "type": "tool_result",
+            "tool": data.get("tool"),
+            "success": data.get("success"),
+            "content": data.get("content"),
+            "error": data.get("error"),
+            "execution_time": data.get("execution_time"),
+        })
 
-        async def collect_completion(event: AgentEvent) -> None:
-            self.execution_logs.append({
-                "type": "completion",
-                "message": "Task completed successfully",
-                "total_input_tokens": event.data.get("total_input_tokens", 0),
-                "total_output_tokens": event.data.get("total_output_tokens", 0),
-                "total_tokens": (
-                    event.data.get("total_input_tokens", 0) +
-                    event.data.get("total_output_tokens", 0)
-                ),
-            })
-            if self.tracer:
-                self.tracer.end_trace(
-                    success=True,
-                    final_response=event.data.get("message", ""),
-                    total_steps=event.data.get("total_steps", self._state.current_step),
-                    reason="task_completed",
-                )
+    async def _collect_user_input(self, event: AgentEvent) -> None:
+        data = event.data
+        self._append_log({
+            "type": "user_input_required",
+            "tool_call_id": data.get("tool_call_id"),
+            "fields": data.get("fields"),
+            "context": data.get("context"),
+        })
 
-        async def collect_error(event: AgentEvent) -> None:
-            reason = event.data.get("reason", "error")
-            if reason == "max_steps_reached":
-                self.execution_logs.append({
-                    "type": "max_steps_reached",
-                    "message": event.data.get("message"),
-                    "total_input_tokens": self._state.total_input_tokens,
-                    "total_output_tokens": self._state.total_output_tokens,
-                    "total_tokens": self._state.total_tokens,
-                })
-            else:
-                self.execution_logs.append({
-                    "type": "error",
-                    "message": event.data.get("message"),
-                })
-            if self.tracer:
-                self.tracer.end_trace(
-                    success=False,
-                    final_response=event.data.get("message", ""),
-                    total_steps=self._state.current_step,
-                    reason=reason,
-                )
+    async def _collect_completion(self, event: AgentEvent) -> None:
+        data = event.data
+        total_input_tokens = data.get("total_input_tokens", 0)
+        total_output_tokens = data.get("total_output_tokens", 0)
+        self._append_log({
+            "type": "completion",
+            "message": "Task completed successfully",
+            "total_input_tokens": total_input_tokens,
+            "total_output_tokens": total_output_tokens,
+            "total_tokens": total_input_tokens + total_output_tokens,
+        })
+        if self.tracer:
+            self._trace_open = False
+            self._llm_metadata = None
+            # end_trace flushes the Langfuse client, a blocking network round trip
+            await asyncio.to_thread(
+                self.tracer.end_trace,
+                success=True,
+                final_response=data.get("message", ""),
+                total_steps=data.get("total_steps", self._state.current_step),
+                reason="task_completed",
+            )
 
-        self._events.clear()
-        self._events.on(EventType.STEP_START, collect_step_start)
-        self._events.on(EventType.LLM_RESPONSE, collect_llm_response)
-        self._events.on(EventType.TOOL_START, collect_tool_start)
-        self._events.on(EventType.TOOL_END, collect_tool_end)
-        self._events.on(EventType.USER_INPUT_REQUIRED, collect_user_input)
-        self._events.on(EventType.COMPLETION, collect_completion)
-        self._events.on(EventType.ERROR, collect_error)
+    async def _collect_error(self, event: AgentEvent) -> None:
+        data = event.data
+        reason = data.get("reason", "error")
+        if reason == "max_steps_reached":
+            self._append_log({
+                "type": "max_steps_reached",
+                "message": data.get("message"),
+                "total_input_tokens": self._state.total_input_tokens,
+                "total_output_tokens": self._state.total_output_tokens,
+                "total_tokens": self._state.total_tokens,
+            })
+        else:
+            self._append_log({
+                "type": "error",
+                "message": data.get("message"),
+            })
+        if self.tracer:
+            self._trace_open = False
+            self._llm_metadata = None
+            await asyncio.to_thread(
+                self.tracer.end_trace,
+                success=False,
+                final_response=data.get("message", ""),
+                total_steps=self._state.current_step,
+                reason=reason,
+            )
 
     def _setup_tracer(self) -> None:
         if not self.enable_logging:
             self.tracer = None
+            self._llm_metadata = None
+            return
+
+        # A run that paused for user input left its trace open; resume continues it
+        if self._continue_trace and self._trace_open and self.tracer is not None:
             return
 
         self.tracer = get_tracer(
@@ -1207,14 +2027,27 @@ class Agent:
             metadata={"max_steps": self.max_steps},
         )
         task = ""
-        if self._state.messages and len(self._state.messages) > 1:
-            for msg in reversed(self._state.messages):
-                if msg.role == "user":
-                    task = msg.content[:200] if msg.content else ""
-                    break
+        if len(self._state.messages) > 1:
+            index = self._state.last_user_index()
+            if index >= 0:
+                content = self._state.messages[index].content
+                task = content[:200] if content else ""
         self.tracer.start_trace(task)
+        self._trace_open = True
+        self._llm_metadata = self.tracer.get_litellm_metadata()
 
     async def run(self, task: Optional[str] = None) -> tuple[str, list[dict[str, Any]]]:
+        """执行 Agent 直到完成、出错、达到 max_steps 或等待用户输入.
+
+        Args:
+            task: Ralph 模式下的任务描述（标准模式使用已添加的用户消息）
+
+        Returns:
+            (最终结果, 执行日志列表)。设置 log_sink 时记录只交给 sink，
+            返回的日志列表为空；设置 max_execution_logs 时只保留最新的记录。
+            Team 和 SpawnAgentTool 从该列表统计步数和工具调用，因此它们
+            创建的 Agent 不设置 log_sink。
+        """
         if self._ralph_loop:
             if task:
                 return await self._run_ralph_internal(task)
@@ -1226,7 +2059,7 @@ class Agent:
         self._setup_tracer()
         self._setup_execution_logging()
         result = await self._loop.run(self._state, self._get_llm_metadata())
-        return result, self.execution_logs
+        return result, list(self.execution_logs)
 
     async def run_stream(self, task: Optional[str] = None) -> AsyncIterator[dict[str, Any]]:
         if self._ralph_loop:
@@ -1245,7 +2078,10 @@ class Agent:
             yield event
 
     def _get_last_user_message(self) -> Optional[str]:
-        for msg in reversed(self._state.messages):
+        messages = self._state.messages
+        # Start from the newest user message; older ones are only reached if it is empty
+        for index in range(self._state.last_user_index(), -1, -1):
+            msg = messages[index]
             if msg.role == "user" and msg.content:
                 if isinstance(msg.content, str):
                     return msg.content
@@ -1253,13 +2089,38 @@ class Agent:
         return None
 
     def _get_llm_metadata(self) -> Optional[dict[str, Any]]:
-        if self.tracer:
-            return self.tracer.get_litellm_metadata()
-        return None
+        return self._llm_metadata
 
     def get_history(self) -> list[Message]:
+        """Return a copy of the message history.
+
+        The caller may modify the returned list. Read-only callers that poll
+        the history should use :meth:`get_history_snapshot`, which does not
+        copy the list on every call.
+
+        Returns:
+            Messages in conversation order
+        """
         return self._state.messages.copy()
 
+    def get_history_snapshot(self) -> tuple[Message, ...]:
+        """Return a read-only snapshot of the message history.
+
+        The tuple is reused until the message list grows, shrinks or is
+        replaced, so repeated polling of an idle agent does not copy the
+        history each time.
+
+        Returns:
+            Messages in conversation order
+        """
+        messages = self._state.messages
+        snapshot = self._history_snapshot
+        if messages is not self._history_source or snapshot is None or len(snapshot) != len(messages):
+            snapshot = tuple(messages)
+            self._history_source = messages
+            self._history_snapshot = snapshot
+        return snapshot
+
     @property
     def pending_user_input(self) -> Optional[UserInputRequest]:
         return self._state.pending_user_input
@@ -1269,29 +2130,26 @@ class Agent:
         return self._state.is_waiting_input
 
     def provide_user_input(self, field_values: dict[str, Any]) -> None:
-        if not self._state.pending_user_input:
+        pending = self._state.pending_user_input
+        if not pending:
             raise ValueError("No pending user input request")
 
-        for field in self._state.pending_user_input.fields:
+        # Apply the new values and build the result list in one pass
+        user_input_result = []
+        for field in pending.fields:
             if field.field_name in field_values:
                 field.value = field_values[field.field_name]
+            user_input_result.append({"name": field.field_name, "value": field.value})
 
-        user_input_result = [
-            {"name": field.field_name, "value": field.value}
-            for field in self._state.pending_user_input.fields
-        ]
-
-        tool_msg = Message(
-            role="tool",
-            content=f"User inputs received: {json.dumps(user_input_result, ensure_ascii=False)}",
-            tool_call_id=self._state.pending_user_input.tool_call_id,
-            name=GetUserInputTool.TOOL_NAME,
-        )
-        self._state.messages.append(tool_msg)
+        self._state.messages.append(_tool_message(
+            f"User inputs received: {json.dumps(user_input_result, ensure_ascii=False)}",
+            pending.tool_call_id,
+            GetUserInputTool.TOOL_NAME,
+        ))
 
-        self.execution_logs.append({
+        self._append_log({
             "type": "user_input_received",
-            "tool_call_id": self._state.pending_user_input.tool_call_id,
+            "tool_call_id": pending.tool_call_id,
             "field_values": field_values,
         })
 
@@ -1300,13 +2158,21 @@ class Agent:
     async def resume(self) -> tuple[str, list[dict[str, Any]]]:
         if self._state.pending_user_input:
             raise ValueError("Cannot resume: still waiting for user input. Call provide_user_input first.")
-        return await self.run()
+        self._continue_trace = True
+        try:
+            return await self.run()
+        finally:
+            self._continue_trace = False
 
     async def resume_stream(self) -> AsyncIterator[dict[str, Any]]:
         if self._state.pending_user_input:
             raise ValueError("Cannot resume: still waiting for user input. Call provide_user_input first.")
-        async for event in self.run_stream():
-            yield event
+        self._continue_trace = True
+        try:
+            async for event in self.run_stream():
+                yield event
+        finally:
+            self._continue_trace = False
 
     @property
     def _pending_user_input(self) -> Optional[UserInputRequest]:
@@ -1333,10 +2199,11 @@ class Agent:
         self._state.paused_tool_call_id = value
 
     def _truncate_tool_output(self, content: str) -> str:
-        if len(content) <= self.tool_output_limit:
+        limit = self.tool_output_limit
+        n = len(content)
+        if n <= limit:
             return content
-        truncated = content[:self.tool_output_limit]
-        return f"{truncated}\n\n[... output truncated, {len(content) - self.tool_output_limit} more characters ...]"
+        return f"{content[:limit]}\n\n[... output truncated, {n - limit} more characters ...]"
 
     async def _handle_ralph_tool_result(
         self,
@@ -1398,10 +2265,15 @@ class Agent:
         if not self._ralph_loop:
             return
 
+        # Rebuilding the loop's tool schemas is only needed when the tool set changed
+        if self._ralph_tool_items is not None and list(self.tools.items()) == self._ralph_tool_items:
+            return
+
         ralph_tools = self.get_ralph_tools()
         for tool in ralph_tools:
             self.tools[tool.name] = tool
         self._loop.set_tools(self.tools)
+        self._ralph_tool_items = list(self.tools.items())
 
     def _build_ralph_system_prompt(self, base_prompt: str, task: str) -> str:
         """构建 Ralph 模式的系统提示.
@@ -1422,29 +2294,73 @@ class Agent:
         if not self._ralph_loop:
             return base_prompt
 
-        context_prefix = self._ralph_loop.get_context_prefix()
-        iteration = self._ralph_loop.state.iteration
+        return _RALPH_PROMPT_TEMPLATE.format(
+            base_prompt=base_prompt,
+            iteration=self._ralph_loop.state.iteration,
+            task=task,
+            context_prefix=self._ralph_loop.get_context_prefix(),
+        )
 
-        ralph_section = f"""
-## Ralph Mode (Iteration {iteration})
+    async def _summarize_ralph_iteration(self) -> None:
+        """Summarize the finished Ralph iteration into the loop's context."""
+        assert self._ralph_loop is not None
+        window = self._ralph_loop.config.summary_window
+        messages = self._state.messages[-window:] if window > 0 else self._state.messages
+
+        # The summarizer only reads the first SUMMARY_INPUT_CHARS characters
+        parts: list[str] = []
+        size = 0
+        for m in messages:
+            if not m.content:
+                continue
+            part = f"{m.role}: {m.content[:500]}"
+            parts.append(part)
+            size += len(part) + 1
+            if size > SUMMARY_INPUT_CHARS:
+                break
+        messages_content = "\n".join(parts)
+        await self._ralph_loop.summarize_iteration(messages_content)
 
-You are operating in Ralph iterative mode. Your task is:
-{task}
+    def _prepare_ralph_iteration(self, task: str) -> None:
+        """Reset the conversation to the Ralph prompt for a new iteration.
 
-### Working Memory
-{context_prefix}
+        Args:
+            task: Task description repeated every iteration
+        """
+        ralph_system_prompt = self._build_ralph_system_prompt(self.system_prompt, task)
+        self._state.messages = [
+            Message(role="system", content=ralph_system_prompt),
+            Message(role="user", content=task),
+        ]
 
-### Completion
-When you have completed the task, use the `signal_completion` tool or output:
-<promise>TASK COMPLETE</promise>
+    def _finish_ralph_iteration(
+        self,
+        iteration: int,
+        result: str,
+    ) -> tuple[bool, list[tuple[EventType, dict[str, Any]]]]:
+        """Run completion detection for a finished Ralph iteration.
 
-### Guidelines
-- Review the working memory for context from previous iterations
-- Use `update_working_memory` to record progress and findings
-- Use `get_cached_result` to retrieve full tool outputs when summaries are insufficient
-- Focus on making incremental progress each iteration
-"""
-        return f"{base_prompt}\n{ralph_section}"
+        Args:
+            iteration: Iteration number that just finished
+            result: Final assistant response of the iteration
+
+        Returns:
+            Whether the task is complete, and the Ralph events to publish
+        """
+        assert self._ralph_loop is not None
+        completion_check = self._ralph_loop.check_completion(result)
+        reason = completion_check.reason.value if completion_check.reason else None
+
+        events: list[tuple[EventType, dict[str, Any]]] = [(
+            EventType.RALPH_ITERATION_END,
+            {"iteration": iteration, "completed": completion_check.completed, "reason": reason},
+        )]
+        if completion_check.completed:
+            events.append((
+                EventType.RALPH_COMPLETION,
+                {"iteration": iteration, "reason": reason, "message": completion_check.message},
+            ))
+        return completion_check.completed, events
 
     async def _run_ralph_internal(self, task: str) -> tuple[str, list[dict[str, Any]]]:
         """执行 Ralph 迭代循环.
@@ -1470,51 +2386,28 @@ When you have completed the task, use the `signal_completion` tool or output:
         while not self._ralph_loop.state.completed:
             iteration = self._ralph_loop.start_iteration()
 
-            await self._events.emit(AgentEvent(
-                type=EventType.RALPH_ITERATION_START,
-                step=0,
-                data={"iteration": iteration, "max_iterations": self._ralph_loop.config.max_iterations},
-            ))
+            if self._events.has_listeners(EventType.RALPH_ITERATION_START):
+                await self._events.emit(AgentEvent(
+                    type=EventType.RALPH_ITERATION_START,
+                    step=0,
+                    data={"iteration": iteration, "max_iterations": self._ralph_loop.config.max_iterations},
+                ))
 
-            ralph_system_prompt = self._build_ralph_system_prompt(self.system_prompt, task)
-            self._state.messages = [
-                Message(role="system", content=ralph_system_prompt),
-                Message(role="user", content=task),
-            ]
+            self._prepare_ralph_iteration(task)
 
             result = await self._loop.run(self._state, self._get_llm_metadata())
             final_result = result
 
-            completion_check = self._ralph_loop.check_completion(result)
-
-            await self._events.emit(AgentEvent(
-                type=EventType.RALPH_ITERATION_END,
-                step=0,
-                data={
-                    "iteration": iteration,
-                    "completed": completion_check.completed,
-                    "reason": completion_check.reason.value if completion_check.reason else None,
-                },
-            ))
-
-            if completion_check.completed:
-                await self._events.emit(AgentEvent(
-                    type=EventType.RALPH_COMPLETION,
-                    step=0,
-                    data={
-                        "iteration": iteration,
-                        "reason": completion_check.reason.value if completion_check.reason else None,
-                        "message": completion_check.message,
-                    },
-                ))
+            completed, events = self._finish_ralph_iteration(iteration, result)
+            for event_type, data in events:
+                if self._events.has_listeners(event_type):
+                    await self._events.emit(AgentEvent(type=event_type, step=0, data=data))
+            if completed:
                 break
 
-            messages_content = "\n".join(
-                f"{m.role}: {m.content[:500]}" for m in self._state.messages if m.content
-            )
-            await self._ralph_loop.summarize_iteration(messages_content)
+            await self._summarize_ralph_iteration()
 
-        return final_result, self.execution_logs
+        return final_result, list(self.execution_logs)
 
     async def run_ralph(self, task: str) -> tuple[str, list[dict[str, Any]]]:
         return await self._run_ralph_internal(task)
@@ -1547,11 +2440,7 @@ When you have completed the task, use the `signal_completion` tool or output:
                 "data": {"iteration": iteration, "max_iterations": self._ralph_loop.config.max_iterations},
             }
 
-            ralph_system_prompt = self._build_ralph_system_prompt(self.system_prompt, task)
-            self._state.messages = [
-                Message(role="system", content=ralph_system_prompt),
-                Message(role="user", content=task),
-            ]
+            self._prepare_ralph_iteration(task)
 
             final_content = ""
             async for event in self._loop.run_stream(self._state, self._get_llm_metadata()):
@@ -1559,32 +2448,13 @@ When you have completed the task, use the `signal_completion` tool or output:
                 if event["type"] == "done":
                     final_content = event.get("data", {}).get("message", "")
 
-            completion_check = self._ralph_loop.check_completion(final_content)
-
-            yield {
-                "type": "ralph_iteration_end",
-                "data": {
-                    "iteration": iteration,
-                    "completed": completion_check.completed,
-                    "reason": completion_check.reason.value if completion_check.reason else None,
-                },
-            }
-
-            if completion_check.completed:
-                yield {
-                    "type": "ralph_completion",
-                    "data": {
-                        "iteration": iteration,
-                        "reason": completion_check.reason.value if completion_check.reason else None,
-                        "message": completion_check.message,
-                    },
-                }
+            completed, events = self._finish_ralph_iteration(iteration, final_content)
+            for event_type, data in events:
+                yield {"type": event_type.value, "data": data}
+            if completed:
                 break
 
-            messages_content = "\n".join(
-                f"{m.role}: {m.content[:500]}" for m in self._state.messages if m.content
-            )
-            await self._ralph_loop.summarize_iteration(messages_content)
+            await self._summarize_ralph_iteration()
 
     async def run_ralph_stream(self, task: str) -> AsyncIterator[dict[str, Any]]:
         async for event in self._run_ralph_stream_internal(task):
@@ -1,4 +1,5 @@
 """常见用例的内置团队配置。"""
+import re
 from typing import List
 
 from omni_agent.core.llm_client import LLMClient
@@ -6,6 +7,12 @@ from omni_agent.core.team import Team
 from omni_agent.schemas.team import TeamConfig, TeamMemberConfig
 from omni_agent.tools.base import Tool
 
+# Case-insensitive tool name patterns routing tools to team members;
+# "crawl" also matches firecrawl tools
+_SEARCH_TOOL_RE = re.compile(r"exa|search", re.IGNORECASE)
+_CRAWL_TOOL_RE = re.compile(r"crawl", re.IGNORECASE)
+_RESEARCHER_TOOL_RE = re.compile(r"search|exa|fetch|crawl|web", re.IGNORECASE)
+
 
 def create_web_research_team(
     llm_client: LLMClient,
@@ -33,9 +40,15 @@ def create_web_research_team(
         ...     session_id="user-123"
         ... )
     """
-    # Filter tools by name prefix or type
-    exa_tools = [t.name for t in available_tools if "exa" in t.name.lower() or "search" in t.name.lower()]
-    firecrawl_tools = [t.name for t in available_tools if "firecrawl" in t.name.lower() or "crawl" in t.name.lower()]
+    # Filter tools by name in one pass; a tool may match both members
+    exa_tools: List[str] = []
+    firecrawl_tools: List[str] = []
+    for tool in available_tools:
+        name = tool.name
+        if _SEARCH_TOOL_RE.search(name):
+            exa_tools.append(name)
+        if _CRAWL_TOOL_RE.search(name):
+            firecrawl_tools.append(name)
 
     config = TeamConfig(
         name="Web Research Team",
@@ -106,10 +119,7 @@ def create_default_team(
     """
     general_tools = ["read_file", "bash"]
     coder_tools = ["read_file", "write_file", "edit_file", "bash"]
-    researcher_tools = [
-        t.name for t in available_tools
-        if any(kw in t.name.lower() for kw in ["search", "exa", "fetch", "firecrawl", "crawl", "web"])
-    ]
+    researcher_tools = [t.name for t in available_tools if _RESEARCHER_TOOL_RE.search(t.name)]
 
     config = TeamConfig(
         name="Default Team",
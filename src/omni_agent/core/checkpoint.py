@@ -31,11 +31,12 @@
     # 恢复
     latest = await storage.load_latest("thread_123")
 """
+import asyncio
 import json
 import os
 import time
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, fields, asdict
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Optional, Protocol, runtime_checkable
@@ -58,6 +59,10 @@ class Checkpoint:
     created_at: str
     parent_id: Optional[str] = None
 
+    @staticmethod
+    def new_id() -> str:
+        return f"ckpt_{uuid4().hex[:12]}"
+
     @classmethod
     def create(
         cls,
@@ -65,20 +70,24 @@ class Checkpoint:
         thread_id: str,
         step: int,
         status: str,
-        messages: list[Message],
+        messages: list[Message] | list[dict[str, Any]],
         pending_tool_calls: Optional[list[ToolCall]] = None,
         input_tokens: int = 0,
         output_tokens: int = 0,
         metadata: Optional[dict[str, Any]] = None,
         parent_id: Optional[str] = None,
+        checkpoint_id: Optional[str] = None,
     ) -> "Checkpoint":
         return cls(
-            id=f"ckpt_{uuid4().hex[:12]}",
+            id=checkpoint_id or cls.new_id(),
             agent_id=agent_id,
             thread_id=thread_id,
             step=step,
             status=status,
-            messages=[cls._serialize_message(m) for m in messages],
+            messages=[
+                m if isinstance(m, dict) else cls.serialize_message(m)
+                for m in messages
+            ],
             pending_tool_calls=[cls._serialize_tool_call(tc) for tc in (pending_tool_calls or [])],
             token_usage={"input": input_tokens, "output": output_tokens},
             metadata=metadata or {},
@@ -87,7 +96,7 @@ class Checkpoint:
         )
 
     @staticmethod
-    def _serialize_message(msg: Message) -> dict[str, Any]:
+    def serialize_message(msg: Message) -> dict[str, Any]:
         data = {
             "role": msg.role,
             "content": msg.content,
@@ -153,6 +162,18 @@ class Checkpoint:
     def to_dict(self) -> dict[str, Any]:
         return asdict(self)
 
+    def to_json(self) -> str:
+        """Serialize to compact JSON without ``asdict``'s deep copy.
+
+        Fields already hold plain JSON data, so they are encoded in place;
+        without ``indent`` the C encoder is used.
+        """
+        return json.dumps(
+            {f.name: getattr(self, f.name) for f in fields(self)},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "Checkpoint":
         return cls(**data)
@@ -183,6 +204,10 @@ class CheckpointStorage(Protocol):
     async def delete_thread(self, thread_id: str) -> int:
         ...
 
+    # Optional: storages may also provide
+    # ``async def delete_older_than(self, thread_id: str, keep: int) -> int``
+    # to prune a thread in one call; AgentLoop falls back to list + delete.
+
 
 class FileCheckpointStorage:
 
@@ -191,6 +216,9 @@ class FileCheckpointStorage:
             base_dir = os.path.expanduser("~/.omni-agent/checkpoints")
         self._base_dir = Path(base_dir)
         self._base_dir.mkdir(parents=True, exist_ok=True)
+        # created_at of files written by this instance, so pruning does not
+        # re-parse whole checkpoints just to order them
+        self._created_at: dict[Path, str] = {}
 
     def _get_thread_dir(self, thread_id: str) -> Path:
         thread_dir = self._base_dir / thread_id
@@ -202,9 +230,9 @@ class FileCheckpointStorage:
 
     async def save(self, checkpoint: Checkpoint) -> None:
         path = self._get_checkpoint_path(checkpoint.thread_id, checkpoint.id)
-        data = checkpoint.to_dict()
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        data = checkpoint.to_json()
+        await asyncio.to_thread(path.write_text, data, encoding="utf-8")
+        self._created_at[path] = checkpoint.created_at
 
     async def load(self, checkpoint_id: str) -> Optional[Checkpoint]:
         for thread_dir in self._base_dir.iterdir():
@@ -264,6 +292,7 @@ class FileCheckpointStorage:
             path = thread_dir / f"{checkpoint_id}.json"
             if path.exists():
                 path.unlink()
+                self._created_at.pop(path, None)
                 return True
         return False
 
@@ -275,6 +304,7 @@ class FileCheckpointStorage:
         count = 0
         for path in thread_dir.glob("ckpt_*.json"):
             path.unlink()
+            self._created_at.pop(path, None)
             count += 1
 
         if not any(thread_dir.iterdir()):
@@ -282,6 +312,32 @@ class FileCheckpointStorage:
 
         return count
 
+    async def delete_older_than(self, thread_id: str, keep: int) -> int:
+        return await asyncio.to_thread(self._delete_older_than, thread_id, keep)
+
+    def _delete_older_than(self, thread_id: str, keep: int) -> int:
+        thread_dir = self._get_thread_dir(thread_id)
+        entries: list[tuple[str, Path]] = []
+        for path in thread_dir.glob("ckpt_*.json"):
+            created_at = self._created_at.get(path)
+            if created_at is None:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        created_at = json.load(f)["created_at"]
+                except (json.JSONDecodeError, KeyError):
+                    continue
+                self._created_at[path] = created_at
+            entries.append((created_at, path))
+
+        if len(entries) <= keep:
+            return 0
+
+        entries.sort(key=lambda e: e[0], reverse=True)
+        for _, path in entries[keep:]:
+            path.unlink(missing_ok=True)
+            self._created_at.pop(path, None)
+        return len(entries) - keep
+
 
 class MemoryCheckpointStorage:
 
@@ -340,6 +396,24 @@ class MemoryCheckpointStorage:
                 count += 1
         return count
 
+    async def delete_older_than(self, thread_id: str, keep: int) -> int:
+        checkpoints = [
+            self._checkpoints[cid]
+            for cid in self._thread_index.get(thread_id, [])
+            if cid in self._checkpoints
+        ]
+        if len(checkpoints) <= keep:
+            return 0
+
+        checkpoints.sort(key=lambda c: c.created_at, reverse=True)
+        kept_ids = {c.id for c in checkpoints[:keep]}
+        for old in checkpoints[keep:]:
+            del self._checkpoints[old.id]
+        self._thread_index[thread_id] = [
+            cid for cid in self._thread_index[thread_id] if cid in kept_ids
+        ]
+        return len(checkpoints) - keep
+
 
 @dataclass
 class CheckpointConfig:
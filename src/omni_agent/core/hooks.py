@@ -8,7 +8,7 @@ if TYPE_CHECKING:
     from omni_agent.core.agent import AgentState
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class HookContext:
     """Hook 执行上下文.
 
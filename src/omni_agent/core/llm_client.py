@@ -108,6 +108,56 @@ class LLMClient:
 
         return 16384  # 未知提供商默认值
 
+    def _system_message(self, system: str) -> dict[str, Any]:
+        """构造 system 消息，Anthropic 模型附带 cache_control 以复用提示缓存.
+
+        OpenAI 等提供商会自动缓存相同前缀，无需标记。
+        """
+        model_lower = self.model.lower()
+        if "anthropic" in model_lower or "claude" in model_lower:
+            return {
+                "role": "system",
+                "content": [
+                    {"type": "text", "text": system, "cache_control": {"type": "ephemeral"}},
+                ],
+            }
+        return {"role": "system", "content": system}
+
+    def _metadata_kwargs(self, metadata: dict[str, Any] | None) -> dict[str, Any]:
+        """拆分请求元数据：prompt_cache_key 作为请求参数发给 OpenAI，其余仅供日志/回调.
+
+        LiteLLM 的 ``metadata`` 不会发送给提供商，因此缓存键需放入请求体；
+        其他提供商不支持该参数，直接丢弃。
+        """
+        if not metadata:
+            return {}
+        metadata = dict(metadata)
+        cache_key = metadata.pop("prompt_cache_key", None)
+        kwargs: dict[str, Any] = {}
+        model_lower = self.model.lower()
+        if cache_key and (
+            model_lower.startswith("openai/")
+            or model_lower.startswith(("gpt-", "chatgpt-", "o1", "o3", "o4"))
+        ):
+            kwargs["extra_body"] = {"prompt_cache_key": cache_key}
+        if metadata:
+            kwargs["metadata"] = metadata
+        return kwargs
+
+    @staticmethod
+    def _token_usage(usage_data: Any) -> TokenUsage:
+        """从 LiteLLM usage 中提取 token 统计（含提示缓存命中/写入数）."""
+        cache_read = getattr(usage_data, "cache_read_input_tokens", None)
+        if not cache_read:
+            details = getattr(usage_data, "prompt_tokens_details", None)
+            cache_read = getattr(details, "cached_tokens", None) if details else None
+        return TokenUsage(
+            input_tokens=getattr(usage_data, "prompt_tokens", 0) or 0,
+            output_tokens=getattr(usage_data, "completion_tokens", 0) or 0,
+            cache_creation_input_tokens=getattr(usage_data, "cache_creation_input_tokens", 0) or 0,
+            cache_read_input_tokens=cache_read or 0,
+        )
+
     def _adjust_max_tokens(self, requested: int) -> int:
         """调整 max_tokens 以适应提供商限制."""
         limit = self._get_max_tokens_limit()
@@ -149,7 +199,7 @@ class LLMClient:
                             "type": "function",
                             "function": {
                                 "name": tc.function.name,
-                                "arguments": json.dumps(tc.function.arguments)
+                                "arguments": tc.function.arguments_json()
                                     if isinstance(tc.function.arguments, dict)
                                     else tc.function.arguments,
                             },
@@ -198,7 +248,7 @@ class LLMClient:
     ) -> Any:
         """通过 LiteLLM 执行 API 请求."""
         if system:
-            messages = [{"role": "system", "content": system}] + messages
+            messages = [self._system_message(system)] + messages
 
         kwargs: dict[str, Any] = {
             "model": self.model,
@@ -216,8 +266,7 @@ class LLMClient:
             kwargs["tools"] = tools
             kwargs["tool_choice"] = "auto"
 
-        if metadata:
-            kwargs["metadata"] = metadata
+        kwargs.update(self._metadata_kwargs(metadata))
 
         response = await acompletion(**kwargs)
         return response
@@ -280,13 +329,7 @@ class LLMClient:
                     )
                 )
 
-        usage_data = response.usage
-        usage = TokenUsage(
-            input_tokens=getattr(usage_data, "prompt_tokens", 0),
-            output_tokens=getattr(usage_data, "completion_tokens", 0),
-            cache_creation_input_tokens=0,
-            cache_read_input_tokens=0,
-        )
+        usage = self._token_usage(response.usage)
 
         return LLMResponse(
             content=text_content,
@@ -322,7 +365,7 @@ class LLMClient:
         openai_tools = self._convert_tools(tools)
 
         if system_message:
-            api_messages = [{"role": "system", "content": system_message}] + api_messages
+            api_messages = [self._system_message(system_message)] + api_messages
 
         kwargs: dict[str, Any] = {
             "model": self.model,
@@ -341,8 +384,7 @@ class LLMClient:
             kwargs["tools"] = openai_tools
             kwargs["tool_choice"] = "auto"
 
-        if metadata:
-            kwargs["metadata"] = metadata
+        kwargs.update(self._metadata_kwargs(metadata))
 
         response = await acompletion(**kwargs)
 
@@ -19,6 +19,9 @@ from pathlib import Path
 from typing import Any, Callable, Coroutine, Optional
 from uuid import uuid4
 
+# 迭代摘要时传给摘要函数的最大字符数
+SUMMARY_INPUT_CHARS = 8000
+
 
 class ContextStrategy(Enum):
     """上下文管理策略."""
@@ -48,6 +51,7 @@ class RalphConfig:
         completion_conditions: 启用的完成检测条件
         memory_dir: 工作记忆存储目录
         summarize_token_threshold: 触发摘要的 token 阈值
+        summary_window: 迭代摘要只取最近的消息条数（0 表示全部）
     """
     enabled: bool = False
     max_iterations: int = 20
@@ -63,6 +67,7 @@ class RalphConfig:
     )
     memory_dir: str = ".ralph"
     summarize_token_threshold: int = 50000
+    summary_window: int = 0
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -74,6 +79,7 @@ class RalphConfig:
             "completion_conditions": [c.value for c in self.completion_conditions],
             "memory_dir": self.memory_dir,
             "summarize_token_threshold": self.summarize_token_threshold,
+            "summary_window": self.summary_window,
         }
 
 
@@ -508,7 +514,7 @@ class ContextManager:
     ) -> str:
         if self._summarize_fn:
             summary = await self._summarize_fn(
-                f"Summarize iteration {iteration} progress:\n{messages_content[:8000]}"
+                f"Summarize iteration {iteration} progress:\n{messages_content[:SUMMARY_INPUT_CHARS]}"
             )
         else:
             summary = f"Iteration {iteration} completed. See working memory for details."
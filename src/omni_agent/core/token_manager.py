@@ -21,7 +21,7 @@
     compressed = await manager.maybe_summarize_messages(messages)
 """
 import logging
-from typing import Any
+from typing import Any, Optional
 
 import tiktoken
 
@@ -82,28 +82,41 @@ class TokenManager:
         if not self.tiktoken_available:
             return self._estimate_tokens_fallback(messages)
 
+        return sum(self.estimate_message_tokens(msg) for msg in messages)
+
+    def estimate_message_tokens(self, msg: Message) -> int:
+        """计算单条消息的 token 数，用于增量统计.
+
+        Args:
+            msg: 要计算的消息
+
+        Returns:
+            该消息的 token 数（含每条消息约 4 token 的元数据开销）
+        """
+        if not self.tiktoken_available:
+            return self._estimate_tokens_fallback([msg])
+
         total_tokens = 0
 
-        for msg in messages:
-            # Count text content
-            if isinstance(msg.content, str):
-                total_tokens += len(self.encoding.encode(msg.content))
-            elif isinstance(msg.content, list):
-                for block in msg.content:
-                    if isinstance(block, dict):
-                        # Convert dict to string for calculation
-                        total_tokens += len(self.encoding.encode(str(block)))
+        # Count text content
+        if isinstance(msg.content, str):
+            total_tokens += len(self.encoding.encode(msg.content))
+        elif isinstance(msg.content, list):
+            for block in msg.content:
+                if isinstance(block, dict):
+                    # Convert dict to string for calculation
+                    total_tokens += len(self.encoding.encode(str(block)))
 
-            # Count thinking (if present)
-            if msg.thinking:
-                total_tokens += len(self.encoding.encode(msg.thinking))
+        # Count thinking (if present)
+        if msg.thinking:
+            total_tokens += len(self.encoding.encode(msg.thinking))
 
-            # Count tool_calls (if present)
-            if msg.tool_calls:
-                total_tokens += len(self.encoding.encode(str(msg.tool_calls)))
+        # Count tool_calls (if present)
+        if msg.tool_calls:
+            total_tokens += len(self.encoding.encode(str(msg.tool_calls)))
 
-            # Metadata overhead per message (approximately 4 tokens)
-            total_tokens += 4
+        # Metadata overhead per message (approximately 4 tokens)
+        total_tokens += 4
 
         return total_tokens
 
@@ -130,7 +143,28 @@ class TokenManager:
         # Rough estimation: average 2.5 characters = 1 token
         return int(total_chars / 2.5)
 
-    async def maybe_summarize_messages(self, messages: list[Message]) -> list[Message]:
+    def should_summarize(self, messages: list[Message], token_count: int) -> bool:
+        """判断是否需要压缩（不做 token 编码的廉价检查）.
+
+        Args:
+            messages: 当前消息历史
+            token_count: 已知的消息历史 token 数
+
+        Returns:
+            满足轮次或 token 触发条件时返回 True
+        """
+        if not self.enable_summarization:
+            return False
+        if token_count > self.token_limit:
+            return True
+        num_rounds = sum(1 for msg in messages[1:] if msg.role == "user")
+        return num_rounds > self.summarize_after_rounds
+
+    async def maybe_summarize_messages(
+        self,
+        messages: list[Message],
+        estimated_tokens: Optional[int] = None,
+    ) -> list[Message]:
         """Summarize message history based on rounds or token limit.
 
         触发条件（满足任一即触发）：
@@ -144,6 +178,7 @@ class TokenManager:
 
         Args:
             messages: Current message history
+            estimated_tokens: Pre-computed token count of ``messages`` (estimated here if omitted)
 
         Returns:
             Summarized message history (or original if no summarization needed)
@@ -154,7 +189,8 @@ class TokenManager:
         # 统计对话轮次（user 消息数量，排除 system）
         user_indices = [i for i, msg in enumerate(messages) if msg.role == "user" and i > 0]
         num_rounds = len(user_indices)
-        estimated_tokens = self.estimate_tokens(messages)
+        if estimated_tokens is None:
+            estimated_tokens = self.estimate_tokens(messages)
 
         # 检查是否需要压缩：轮次超过阈值 或 token 超限
         need_compress = (
@@ -74,11 +74,14 @@ class ToolExecutor:
                 tool = self._tools[function_name]
                 result = await tool.execute(**arguments)
                 if result.success:
-                    result = ToolResult(
-                        success=True,
-                        content=self._truncate_output(result.content),
-                        error=None,
-                    )
+                    content = self._truncate_output(result.content)
+                    # Only rebuild the result when truncation or a stray error changes it
+                    if content is not result.content or result.error is not None:
+                        result = ToolResult(
+                            success=True,
+                            content=content,
+                            error=None,
+                        )
             except Exception as e:
                 result = ToolResult(
                     success=False,
@@ -115,11 +118,8 @@ class ToolExecutor:
             return results
 
     def _truncate_output(self, content: str) -> str:
-        if not content:
+        limit = self._output_limit
+        n = len(content)
+        if n <= limit:
             return content
-        if len(content) > self._output_limit:
-            return (
-                content[: self._output_limit]
-                + f"\n...[truncated, total {len(content)} chars]"
-            )
-        return content
+        return f"{content[:limit]}\n...[truncated, total {n} chars]"
@@ -1,12 +1,26 @@
 """消息和响应模式。"""
+import json
 from typing import Any, Optional, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class FunctionCall(BaseModel):
     """Function call within a tool call."""
     name: str
     arguments: dict[str, Any]
+    _arguments_json: Optional[str] = PrivateAttr(default=None)
+
+    def arguments_json(self) -> str:
+        """Return ``arguments`` as a JSON string, serialized once per call."""
+        if self._arguments_json is None:
+            self._arguments_json = json.dumps(self.arguments)
+        return self._arguments_json
+
+    def __eq__(self, other: object) -> bool:
+        # Ignore the serialization cache, which pydantic would otherwise compare
+        if not isinstance(other, FunctionCall):
+            return NotImplemented
+        return self.name == other.name and self.arguments == other.arguments
 
 
 class ToolCall(BaseModel):
@@ -1,4 +1,5 @@
 """函数工具 - 从可调用函数动态创建工具。"""
+import asyncio
 import inspect
 from typing import Any, Callable, get_type_hints, Optional
 
@@ -94,6 +95,10 @@ class FunctionTool(Tool):
     """从可调用函数创建的工具。
 
     允许动态创建工具而无需继承 Tool 类。
+
+    同步函数通过 asyncio.to_thread 在工作线程中执行，不会阻塞事件循环。
+    因此非线程安全的函数，或会访问事件循环（如 asyncio.get_running_loop）
+    的函数，应改为 async 函数传入。
     """
 
     def __init__(
@@ -112,6 +117,7 @@ class FunctionTool(Tool):
             parameters: 参数的 JSON Schema（未提供时自动生成）
         """
         self._func = func
+        self._is_async = inspect.iscoroutinefunction(func)
         self._name = name or func.__name__
         self._description = description or _extract_docstring(func)
         self._parameters = parameters or _generate_json_schema(func)
@@ -131,11 +137,12 @@ class FunctionTool(Tool):
     async def execute(self, **kwargs) -> ToolResult:
         """执行包装的函数。"""
         try:
-            # Check if function is async
-            if inspect.iscoroutinefunction(self._func):
+            if self._is_async:
                 result = await self._func(**kwargs)
             else:
-                result = self._func(**kwargs)
+                # Sync functions run in a worker thread so they neither block
+                # the event loop nor serialize parallel tool calls
+                result = await asyncio.to_thread(self._func, **kwargs)
 
             # Handle different return types
             if isinstance(result, ToolResult):
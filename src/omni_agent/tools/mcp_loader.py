@@ -10,6 +10,8 @@
 官方 SDK 文档：https://github.com/modelcontextprotocol/python-sdk
 """
 import json
+import os
+import sys
 from contextlib import AsyncExitStack
 from pathlib import Path
 from typing import Any, Literal
@@ -25,6 +27,12 @@ from .base import Tool, ToolResult
 TransportType = Literal["stdio", "sse", "http"]
 
 
+def _print(message: str, quiet: bool) -> None:
+    """输出加载状态信息（quiet 为 True 时不输出）。"""
+    if not quiet:
+        print(message)
+
+
 class MCPTool(Tool):
     """官方 SDK 中 MCP 工具的包装器。
 
@@ -146,6 +154,7 @@ class MCPServerConnection:
         # http/sse 参数
         url: str | None = None,
         headers: dict[str, str] | None = None,
+        quiet: bool = False,
     ):
         """初始化 MCP 服务器连接参数。
 
@@ -157,8 +166,10 @@ class MCPServerConnection:
             env: 服务器进程的环境变量（仅 stdio）
             url: 服务器 URL（仅 sse/http）
             headers: HTTP 头（仅 sse/http）
+            quiet: 不输出连接信息，并丢弃 stdio 服务器进程的 stderr
         """
         self.name = name
+        self.quiet = quiet
         self.transport = transport
         # stdio parameters
         self.command = command
@@ -213,9 +224,15 @@ class MCPServerConnection:
                     env=self.env if self.env else None
                 )
 
+                # Quiet mode discards only this server's stderr; the process-wide
+                # stdout/stderr stay untouched for concurrent loaders
+                errlog = sys.stderr
+                if self.quiet:
+                    errlog = self.exit_stack.enter_context(open(os.devnull, "w"))
+
                 # Enter stdio client context
                 read_stream, write_stream = await self.exit_stack.enter_async_context(
-                    stdio_client(server_params)
+                    stdio_client(server_params, errlog=errlog)
                 )
 
             elif self.transport == "sse":
@@ -272,20 +289,24 @@ class MCPServerConnection:
                 )
                 self.tools.append(mcp_tool)
 
-            print(f"✓ Connected to MCP server '{self.name}' ({self.transport}) - loaded {len(self.tools)} tools")
+            _print(
+                f"✓ Connected to MCP server '{self.name}' ({self.transport}) - loaded {len(self.tools)} tools",
+                self.quiet,
+            )
             for tool in self.tools:
                 desc = tool.description[:60] if len(tool.description) > 60 else tool.description
-                print(f"  - {tool.name}: {desc}...")
+                _print(f"  - {tool.name}: {desc}...", self.quiet)
             return True
 
         except Exception as e:
-            print(f"✗ Failed to connect to MCP server '{self.name}': {e}")
+            _print(f"✗ Failed to connect to MCP server '{self.name}': {e}", self.quiet)
             # Clean up exit stack if connection failed
             if self.exit_stack:
                 await self.exit_stack.aclose()
                 self.exit_stack = None
-            import traceback
-            traceback.print_exc()
+            if not self.quiet:
+                import traceback
+                traceback.print_exc()
             return False
 
     async def disconnect(self):
@@ -304,7 +325,7 @@ class MCPServerConnection:
 _mcp_connections: list[MCPServerConnection] = []
 
 
-async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
+async def load_mcp_tools_async(config_path: str = "mcp.json", quiet: bool = False) -> list[Tool]:
     """使用官方 SDK 从配置文件加载 MCP 工具。
 
     此函数实现官方 SDK 的 MCP 客户端模式：
@@ -346,6 +367,7 @@ async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
 
     Args:
         config_path: MCP 配置文件路径（默认："mcp.json"）
+        quiet: 不输出加载信息，并丢弃 stdio 服务器进程的 stderr
 
     Returns:
         表示 MCP 工具的 Tool 对象列表
@@ -362,7 +384,7 @@ async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
     config_file = Path(config_path)
 
     if not config_file.exists():
-        print(f"ℹ️  MCP config not found: {config_path} (skipping MCP tools)")
+        _print(f"ℹ️  MCP config not found: {config_path} (skipping MCP tools)", quiet)
         return []
 
     try:
@@ -373,7 +395,7 @@ async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
         mcp_servers = config.get("mcpServers", {})
 
         if not mcp_servers:
-            print("ℹ️  No MCP servers configured")
+            _print("ℹ️  No MCP servers configured", quiet)
             return []
 
         all_tools = []
@@ -382,7 +404,7 @@ async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
         for server_name, server_config in mcp_servers.items():
             # Skip disabled servers
             if server_config.get("disabled", False):
-                print(f"⊘ Skipping disabled server: {server_name}")
+                _print(f"⊘ Skipping disabled server: {server_name}", quiet)
                 continue
 
             # Determine transport type
@@ -390,7 +412,7 @@ async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
 
             # Validate transport type
             if transport not in ["stdio", "sse", "http"]:
-                print(f"⚠️  Unknown transport '{transport}' for server '{server_name}', skipping")
+                _print(f"⚠️  Unknown transport '{transport}' for server '{server_name}', skipping", quiet)
                 continue
 
             # Create connection based on transport type
@@ -401,7 +423,7 @@ async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
                 env = server_config.get("env", {})
 
                 if not command:
-                    print(f"⚠️  No command specified for stdio server: {server_name}")
+                    _print(f"⚠️  No command specified for stdio server: {server_name}", quiet)
                     continue
 
                 connection = MCPServerConnection(
@@ -410,6 +432,7 @@ async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
                     command=command,
                     args=args,
                     env=env,
+                    quiet=quiet,
                 )
 
             else:  # sse or http
@@ -418,7 +441,7 @@ async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
                 headers = server_config.get("headers", {})
 
                 if not url:
-                    print(f"⚠️  No url specified for {transport} server: {server_name}")
+                    _print(f"⚠️  No url specified for {transport} server: {server_name}", quiet)
                     continue
 
                 connection = MCPServerConnection(
@@ -426,6 +449,7 @@ async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
                     transport=transport,  # type: ignore
                     url=url,
                     headers=headers,
+                    quiet=quiet,
                 )
 
             # Connect to server
@@ -435,22 +459,26 @@ async def load_mcp_tools_async(config_path: str = "mcp.json") -> list[Tool]:
                 _mcp_connections.append(connection)
                 all_tools.extend(connection.tools)
 
-        print(f"\n✅ Total MCP tools loaded: {len(all_tools)}")
+        _print(f"\n✅ Total MCP tools loaded: {len(all_tools)}", quiet)
 
         return all_tools
 
     except Exception as e:
-        print(f"❌ Error loading MCP config: {e}")
-        import traceback
-        traceback.print_exc()
+        _print(f"❌ Error loading MCP config: {e}", quiet)
+        if not quiet:
+            import traceback
+            traceback.print_exc()
         return []
 
 
-async def cleanup_mcp_connections():
+async def cleanup_mcp_connections(quiet: bool = False):
     """清理所有 MCP 连接。
 
     应在应用程序关闭时调用，以正确关闭所有 MCP 服务器连接。
 
+    Args:
+        quiet: 不输出清理信息
+
     Example:
         ```python
         # 在 FastAPI 生命周期中
@@ -466,4 +494,4 @@ async def cleanup_mcp_connections():
     for connection in _mcp_connections:
         await connection.disconnect()
     _mcp_connections.clear()
-    print("🧹 All MCP connections cleaned up")
+    _print("🧹 All MCP connections cleaned up", quiet)
@@ -0,0 +1,47 @@
+"""CLISessionHandler 测试."""
+from omni_agent.cli.session_handler import CLISessionHandler
+from omni_agent.schemas.message import Message
+
+
+def _history() -> list[Message]:
+    return [
+        Message(role="system", content="system prompt"),
+        Message(role="user", content="hello"),
+        Message(role="assistant", content="hi"),
+    ]
+
+
+class TestCountRoles:
+    def test_counts_appended_messages_incrementally(self):
+        handler = CLISessionHandler(auto_save=False)
+        messages = _history()
+        assert handler.count_roles(messages) == {"system": 1, "user": 1, "assistant": 1}
+
+        messages.append(Message(role="user", content="again"))
+        assert handler.count_roles(messages) == {"system": 1, "user": 2, "assistant": 1}
+        # An unchanged history is not recounted
+        assert handler.count_roles(messages)["user"] == 2
+
+    def test_replaced_list_is_recounted(self):
+        handler = CLISessionHandler(auto_save=False)
+        messages = _history()
+        handler.count_roles(messages)
+
+        # /clear keeps only the system message in a new list
+        assert handler.count_roles([messages[0]]) == {"system": 1}
+
+    def test_shrunk_list_is_recounted(self):
+        handler = CLISessionHandler(auto_save=False)
+        messages = _history()
+        handler.count_roles(messages)
+
+        del messages[-1]
+        assert handler.count_roles(messages) == {"system": 1, "user": 1}
+
+    def test_reset_forgets_cached_counts(self):
+        handler = CLISessionHandler(auto_save=False)
+        messages = _history()
+        handler.count_roles(messages)
+
+        handler.reset_role_counts()
+        assert handler.count_roles(messages) == {"system": 1, "user": 1, "assistant": 1}
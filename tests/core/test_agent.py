@@ -0,0 +1,67 @@
+"""Agent 测试."""
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from omni_agent.core import Agent
+from omni_agent.schemas.message import LLMResponse, Message, TokenUsage
+
+
+@pytest.fixture
+def agent(tmp_path) -> Agent:
+    return Agent(
+        llm_client=Mock(model="test-model"),
+        tools=[],
+        workspace_dir=str(tmp_path),
+        enable_logging=False,
+    )
+
+
+class TestHistory:
+    def test_get_history_returns_a_mutable_copy(self, agent):
+        history = agent.get_history()
+        assert isinstance(history, list)
+        history.append(Message(role="user", content="not in the agent"))
+        assert len(agent.messages) == 1
+
+    def test_snapshot_is_reused_while_history_is_unchanged(self, agent):
+        assert agent.get_history_snapshot() is agent.get_history_snapshot()
+
+    def test_snapshot_refreshes_when_history_grows(self, agent):
+        before = agent.get_history_snapshot()
+        agent.add_user_message("hello")
+        after = agent.get_history_snapshot()
+        assert after is not before
+        assert [m.role for m in after] == ["system", "user"]
+
+    def test_snapshot_refreshes_when_list_is_replaced(self, agent):
+        before = agent.get_history_snapshot()
+        agent.messages = [Message(role="system", content="replaced")]
+        after = agent.get_history_snapshot()
+        assert after is not before
+        assert after[0].content == "replaced"
+
+
+class TestLogSink:
+    @pytest.mark.asyncio
+    async def test_records_go_to_sink_instead_of_execution_logs(self, tmp_path):
+        llm = Mock(model="test-model")
+        llm.generate = AsyncMock(return_value=LLMResponse(
+            content="done", usage=TokenUsage(input_tokens=3, output_tokens=2),
+        ))
+        records = []
+        agent = Agent(
+            llm_client=llm,
+            tools=[],
+            workspace_dir=str(tmp_path),
+            enable_logging=False,
+            log_sink=records.append,
+        )
+        agent.add_user_message("hello")
+
+        result, logs = await agent.run()
+
+        assert result == "done"
+        assert logs == []
+        assert len(agent.execution_logs) == 0
+        assert [record["type"] for record in records] == ["step", "llm_response", "completion"]
@@ -0,0 +1,331 @@
+"""AgentLoop 测试."""
+import asyncio
+import threading
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from omni_agent.core.agent import (
+    _TOKEN_OFFLOAD_THRESHOLD,
+    AgentLoop,
+    AgentState,
+    DeltaCoalescer,
+    EventEmitter,
+    LoopConfig,
+    _buffered,
+)
+from omni_agent.core.token_manager import TokenManager
+from omni_agent.core.tool_executor import ToolExecutor
+from omni_agent.schemas.message import FunctionCall, LLMResponse, Message, ToolCall
+
+
+def _make_loop(budget: int = 0, **config) -> AgentLoop:
+    token_manager = TokenManager(Mock(), enable_summarization=False)
+    return AgentLoop(
+        Mock(model="test-model"), Mock(), token_manager, EventEmitter(),
+        LoopConfig(tail_token_budget=budget, **config),
+    )
+
+
+def _tool_step_history() -> list[Message]:
+    return [
+        Message(role="system", content="system prompt"),
+        Message(role="user", content="hello"),
+        Message(role="assistant", content="Hi, what can I do?"),
+        Message(role="user", content="list the files"),
+        Message(
+            role="assistant",
+            content="",
+            tool_calls=[ToolCall(id="call_1", function=FunctionCall(name="bash", arguments={"cmd": "ls"}))],
+        ),
+        Message(role="tool", content="result line\n" * 50, tool_call_id="call_1", name="bash"),
+    ]
+
+
+class TestBuffered:
+    @pytest.mark.asyncio
+    async def test_producer_exception_is_forwarded(self):
+        async def source():
+            yield {"type": "first"}
+            raise ValueError("stream broke")
+
+        received = []
+        with pytest.raises(ValueError, match="stream broke"):
+            async for item in _buffered(source()):
+                received.append(item["type"])
+        assert received == ["first"]
+
+    @pytest.mark.asyncio
+    async def test_early_close_cancels_producer(self):
+        cancelled = asyncio.Event()
+
+        async def source():
+            yield {"type": "first"}
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            yield {"type": "never"}
+
+        events = _buffered(source())
+        assert (await events.__anext__())["type"] == "first"
+        # Let the producer start waiting on the source
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(events.aclose(), timeout=1)
+        assert cancelled.is_set()
+
+
+class TestAgentStateCounters:
+    @staticmethod
+    def _counting_estimate(calls: list[str]):
+        def estimate(message: Message) -> int:
+            calls.append(message.content)
+            return len(message.content)
+        return estimate
+
+    def test_append_estimates_only_new_messages(self):
+        calls: list[str] = []
+        estimate = self._counting_estimate(calls)
+        state = AgentState(messages=[Message(role="user", content="abc")])
+        assert state.sync_token_count(estimate) == 3
+
+        state.messages.append(Message(role="assistant", content="defgh"))
+        assert state.uncounted_messages() == 1
+        assert state.sync_token_count(estimate) == 8
+        assert calls == ["abc", "defgh"]
+        assert state.uncounted_messages() == 0
+
+    def test_replaced_list_is_recounted(self):
+        calls: list[str] = []
+        estimate = self._counting_estimate(calls)
+        state = AgentState(messages=[Message(role="user", content="abc")])
+        state.sync_token_count(estimate)
+
+        state.messages = [Message(role="user", content="xy")]
+        assert state.uncounted_messages() == 1
+        assert state.sync_token_count(estimate) == 2
+        assert calls == ["abc", "xy"]
+
+    def test_shrunk_list_is_recounted(self):
+        state = AgentState(messages=[
+            Message(role="user", content="abc"),
+            Message(role="assistant", content="defgh"),
+        ])
+        state.sync_token_count(self._counting_estimate([]))
+
+        del state.messages[-1]
+        assert state.uncounted_messages() == 1
+        assert state.sync_token_count(self._counting_estimate([])) == 3
+
+    def test_last_user_index_follows_history(self):
+        state = AgentState(messages=[
+            Message(role="system", content="s"),
+            Message(role="user", content="first"),
+        ])
+        assert state.last_user_index() == 1
+
+        state.messages.extend([
+            Message(role="assistant", content="a"),
+            Message(role="user", content="second"),
+        ])
+        assert state.last_user_index() == 3
+
+        del state.messages[-1]
+        assert state.last_user_index() == 1
+
+        state.messages = [Message(role="system", content="s")]
+        assert state.last_user_index() == -1
+
+    @pytest.mark.asyncio
+    async def test_large_recount_runs_off_the_event_loop(self):
+        threads: set[str] = set()
+
+        def estimate(message: Message) -> int:
+            threads.add(threading.current_thread().name)
+            return 1
+
+        loop = _make_loop()
+        loop._token_manager = Mock(
+            estimate_message_tokens=estimate,
+            should_summarize=Mock(return_value=False),
+        )
+        count = _TOKEN_OFFLOAD_THRESHOLD + 1
+        state = AgentState(messages=[Message(role="user", content="x") for _ in range(count)])
+
+        assert await loop._maybe_summarize(state) == count
+        assert threads and threading.current_thread().name not in threads
+
+        threads.clear()
+        state.messages.append(Message(role="assistant", content="y"))
+        assert await loop._maybe_summarize(state) == count + 1
+        assert threads == {threading.current_thread().name}
+
+
+class TestFitTailBudget:
+    def test_no_budget_keeps_history(self):
+        messages = _tool_step_history()
+        kept, dropped = _make_loop(0)._fit_tail_budget(messages)
+        assert kept is messages
+        assert dropped == 0
+
+    def test_cut_on_tool_result_keeps_owning_assistant(self):
+        kept, dropped = _make_loop(50)._fit_tail_budget(_tool_step_history())
+        assert [m.role for m in kept] == ["system", "user", "assistant", "tool"]
+        assert kept[1].content == "list the files"
+        assert kept[2].tool_calls[0].id == kept[3].tool_call_id
+        assert dropped == 2
+
+    def test_cut_on_assistant_moves_forward_to_user(self):
+        messages = [
+            Message(role="system", content="system prompt"),
+            Message(role="user", content="an old question " * 100),
+            Message(role="assistant", content="an answer"),
+            Message(role="user", content="a new question"),
+        ]
+        kept, dropped = _make_loop(50)._fit_tail_budget(messages)
+        assert [m.content for m in kept] == ["system prompt", "a new question"]
+        assert dropped == 2
+
+
+class TestIterToolResults:
+    @pytest.mark.asyncio
+    async def test_parallel_results_keep_call_order(self):
+        loop = _make_loop(parallel_tools=True)
+
+        async def execute_single(tool_call_id, name, arguments):
+            await asyncio.sleep(arguments["delay"])
+            return tool_call_id
+
+        loop._tool_executor.execute_single = execute_single
+        tool_calls = [
+            ToolCall(id=f"call_{i}", function=FunctionCall(name="wait", arguments={"delay": delay}))
+            for i, delay in enumerate([0.03, 0.0, 0.01])
+        ]
+
+        results = [r async for r in loop._iter_tool_results(tool_calls)]
+        assert results == ["call_0", "call_1", "call_2"]
+
+
+class TestResponseCache:
+    def test_incremental_key_matches_fresh_key(self):
+        history = _tool_step_history()
+        loop = _make_loop()
+        keys = [loop._response_cache_key(history[:n]) for n in range(1, len(history) + 1)]
+        # Shrinking and rebuilding the list rehashes only what changed
+        assert loop._response_cache_key(list(history[:2])) == keys[1]
+        assert loop._response_cache_key(list(history)) == keys[-1]
+
+        for n, key in enumerate(keys, start=1):
+            assert _make_loop()._response_cache_key(history[:n]) == key
+        assert len(set(keys)) == len(keys)
+
+    @pytest.mark.asyncio
+    async def test_tool_call_responses_are_not_cached(self):
+        tool_call = ToolCall(id="call_1", function=FunctionCall(name="missing", arguments={}))
+        llm = Mock(model="test-model")
+        llm.generate = AsyncMock(return_value=LLMResponse(content="", tool_calls=[tool_call]))
+        loop = AgentLoop(
+            llm, ToolExecutor(), TokenManager(Mock(), enable_summarization=False),
+            EventEmitter(), LoopConfig(response_cache_size=4),
+        )
+        loop.set_tools({})
+
+        for _ in range(2):
+            state = AgentState(messages=[Message(role="user", content="run it")])
+            await loop._execute_step(state, None)
+
+        assert llm.generate.await_count == 2
+        assert not loop._response_cache
+
+    @pytest.mark.asyncio
+    async def test_final_answer_is_cached(self):
+        llm = Mock(model="test-model")
+        llm.generate = AsyncMock(return_value=LLMResponse(content="done"))
+        loop = AgentLoop(
+            llm, ToolExecutor(), TokenManager(Mock(), enable_summarization=False),
+            EventEmitter(), LoopConfig(response_cache_size=4),
+        )
+        loop.set_tools({})
+
+        for _ in range(2):
+            state = AgentState(messages=[Message(role="user", content="hello")])
+            await loop._execute_step(state, None)
+
+        assert llm.generate.await_count == 1
+
+
+def _streaming_loop(chunks: list[dict], coalesce_chars: int) -> AgentLoop:
+    async def generate_stream(messages, tools=None, metadata=None):
+        for chunk in chunks:
+            yield chunk
+
+    llm = Mock(model="test-model")
+    llm.generate_stream = generate_stream
+    loop = AgentLoop(
+        llm, ToolExecutor(), TokenManager(Mock(), enable_summarization=False),
+        EventEmitter(), LoopConfig(stream_coalesce_chars=coalesce_chars),
+    )
+    loop.set_tools({})
+    return loop
+
+
+async def _stream_events(loop: AgentLoop) -> list[tuple[str, str]]:
+    state = AgentState(messages=[Message(role="user", content="hello")])
+    return [
+        (event["type"], event["data"].get("delta", ""))
+        async for event in loop._execute_step_stream(state, None)
+        if event["type"] in ("content", "thinking", "tool_call", "done")
+    ]
+
+
+class TestDeltaCoalescer:
+    def test_flushes_at_char_threshold(self):
+        coalescer = DeltaCoalescer(max_chars=4, interval=60)
+        assert coalescer.add("content", "ab") == []
+        assert coalescer.add("content", "cd") == [("content", "abcd")]
+        assert coalescer.add("content", "e") == []
+        assert coalescer.flush() == [("content", "e")]
+        assert coalescer.flush() == []
+
+    def test_flushes_on_kind_change(self):
+        coalescer = DeltaCoalescer(max_chars=100, interval=60)
+        coalescer.add("thinking", "hmm")
+        assert coalescer.add("content", "Hi") == [("thinking", "hmm")]
+        assert coalescer.flush() == [("content", "Hi")]
+
+    @pytest.mark.asyncio
+    async def test_stream_flushes_before_tool_call(self):
+        tool_call = ToolCall(id="call_1", function=FunctionCall(name="missing", arguments={}))
+        loop = _streaming_loop([
+            {"type": "content_delta", "delta": "Let me "},
+            {"type": "content_delta", "delta": "check."},
+            {"type": "tool_use", "tool_call": tool_call},
+            {"type": "done", "response": None},
+        ], coalesce_chars=100)
+
+        events = await _stream_events(loop)
+        assert events[:2] == [("content", "Let me check."), ("tool_call", "")]
+
+    @pytest.mark.asyncio
+    async def test_stream_flushes_before_done(self):
+        loop = _streaming_loop([
+            {"type": "thinking_delta", "delta": "plan"},
+            {"type": "content_delta", "delta": "Hello, "},
+            {"type": "content_delta", "delta": "world"},
+            {"type": "done", "response": None},
+        ], coalesce_chars=100)
+
+        events = await _stream_events(loop)
+        assert events == [("thinking", "plan"), ("content", "Hello, world"), ("done", "")]
+
+    @pytest.mark.asyncio
+    async def test_no_coalescing_by_default(self):
+        loop = _streaming_loop([
+            {"type": "content_delta", "delta": "Hello, "},
+            {"type": "content_delta", "delta": "world"},
+            {"type": "done", "response": None},
+        ], coalesce_chars=0)
+
+        events = await _stream_events(loop)
+        assert events == [("content", "Hello, "), ("content", "world"), ("done", "")]
@@ -0,0 +1,135 @@
+"""AgentLoop 断点保存测试."""
+import asyncio
+
+import pytest
+
+from omni_agent.core.agent import AgentLoop, AgentState, EventEmitter, LoopConfig
+from omni_agent.core.checkpoint import (
+    CheckpointConfig,
+    FileCheckpointStorage,
+    MemoryCheckpointStorage,
+)
+from omni_agent.schemas.message import Message
+
+
+class GatedStorage(MemoryCheckpointStorage):
+    """Memory storage whose writes block until ``release`` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def save(self, checkpoint):
+        self.entered.set()
+        await self.release.wait()
+        await super().save(checkpoint)
+
+
+class FailingStorage(MemoryCheckpointStorage):
+    async def save(self, checkpoint):
+        raise OSError("disk full")
+
+
+def _make_loop(storage, **config) -> AgentLoop:
+    checkpoint = CheckpointConfig(storage=storage, **config)
+    return AgentLoop(None, None, None, EventEmitter(), LoopConfig(checkpoint=checkpoint))
+
+
+def _state() -> AgentState:
+    return AgentState(messages=[Message(role="user", content="hi")])
+
+
+class TestCheckpointWrites:
+    @pytest.mark.asyncio
+    async def test_saves_during_a_write_are_coalesced(self):
+        storage = GatedStorage()
+        loop = _make_loop(storage)
+        state = _state()
+
+        first = await loop._save_checkpoint(state, trigger="step")
+        await storage.entered.wait()
+        superseded = await loop._save_checkpoint(state, trigger="step")
+        latest = await loop._save_checkpoint(state, trigger="step")
+        storage.release.set()
+        await loop.flush_checkpoints()
+
+        assert await storage.load(superseded) is None
+        assert (await storage.load(first)).parent_id is None
+        assert (await storage.load(latest)).parent_id == first
+        assert state.last_checkpoint_id == latest
+
+    @pytest.mark.asyncio
+    async def test_user_input_wait_is_written_before_returning(self):
+        storage = MemoryCheckpointStorage()
+        loop = _make_loop(storage)
+        state = _state()
+
+        queued = await loop._save_checkpoint(state, trigger="step")
+        durable = await loop._save_checkpoint(state, trigger="user_input_wait")
+
+        checkpoint = await storage.load(durable)
+        assert checkpoint is not None
+        assert checkpoint.parent_id == queued
+        assert await storage.load(queued) is not None
+
+
+class TestCheckpointErrors:
+    @pytest.mark.asyncio
+    async def test_flush_raises_background_write_error_once(self):
+        loop = _make_loop(FailingStorage())
+        await loop._save_checkpoint(_state(), trigger="step")
+
+        with pytest.raises(OSError, match="disk full"):
+            await loop.flush_checkpoints()
+        await loop.flush_checkpoints()
+
+    @pytest.mark.asyncio
+    async def test_user_input_wait_error_propagates(self):
+        loop = _make_loop(FailingStorage())
+        with pytest.raises(OSError, match="disk full"):
+            await loop._save_checkpoint(_state(), trigger="user_input_wait")
+
+    @pytest.mark.asyncio
+    async def test_write_error_does_not_replace_run_error(self):
+        loop = _make_loop(FailingStorage())
+        await loop._save_checkpoint(_state(), trigger="step")
+
+        await loop._close_checkpoints(RuntimeError("run failed"))
+        assert loop._ckpt_task.done()
+        assert loop._ckpt_error is None
+
+    @pytest.mark.asyncio
+    async def test_cancelled_run_does_not_wait_for_writes(self):
+        storage = GatedStorage()
+        loop = _make_loop(storage)
+        await loop._save_checkpoint(_state(), trigger="step")
+        await storage.entered.wait()
+
+        await asyncio.wait_for(loop._close_checkpoints(asyncio.CancelledError()), timeout=1)
+        assert not loop._ckpt_task.done()
+
+        storage.release.set()
+        await loop.flush_checkpoints()
+
+
+class TestCheckpointPruning:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("storage_type", ["memory", "file"])
+    async def test_thread_is_pruned_to_max_checkpoints(self, storage_type, tmp_path):
+        if storage_type == "memory":
+            storage = MemoryCheckpointStorage()
+        else:
+            storage = FileCheckpointStorage(str(tmp_path))
+        loop = _make_loop(storage, max_checkpoints_per_thread=3)
+        state = _state()
+
+        for _ in range(25):
+            await loop._save_checkpoint(state, trigger="user_input_wait")
+        # Pruned after the 10th and 20th writes
+        assert len(await storage.list_checkpoints(state.thread_id, limit=100)) == 8
+
+        await loop.flush_checkpoints()
+        remaining = await storage.list_checkpoints(state.thread_id, limit=100)
+        assert len(remaining) == 3
+        assert state.last_checkpoint_id in {checkpoint.id for checkpoint in remaining}
@@ -0,0 +1,22 @@
+import pytest
+
+import omni_agent.core as core
+
+
+class TestCoreExports:
+    """Test the lazily resolved omni_agent.core public API."""
+
+    def test_all_matches_lazy_table(self):
+        """Every exported name has exactly one lazy import entry."""
+        assert len(core.__all__) == len(set(core.__all__))
+        assert set(core.__all__) == set(core._LAZY_IMPORTS)
+
+    def test_all_names_resolve(self):
+        """Every exported name resolves to its defining submodule."""
+        for name in core.__all__:
+            assert getattr(core, name) is not None
+
+    def test_unknown_name_raises(self):
+        """Unknown attributes still raise AttributeError."""
+        with pytest.raises(AttributeError):
+            core.DoesNotExist
@@ -0,0 +1,73 @@
+"""EventEmitter 测试."""
+import asyncio
+
+import pytest
+
+from omni_agent.core.agent import AgentEvent, EventEmitter, EventType
+
+
+def _event(event_type: EventType = EventType.STEP_START) -> AgentEvent:
+    return AgentEvent(type=event_type, data={})
+
+
+class TestDispatch:
+    @pytest.mark.asyncio
+    async def test_failing_handler_waits_for_the_others(self):
+        emitter = EventEmitter()
+        finished = []
+
+        async def failing(event):
+            raise ValueError("handler failed")
+
+        async def slow(event):
+            await asyncio.sleep(0.02)
+            finished.append("slow")
+
+        emitter.on_all(failing)
+        emitter.on_all(slow)
+
+        with pytest.raises(ValueError, match="handler failed"):
+            await emitter.emit(_event())
+        assert finished == ["slow"]
+
+
+class TestBatch:
+    @pytest.mark.asyncio
+    async def test_queued_events_are_flushed_when_body_raises(self):
+        emitter = EventEmitter()
+        received = []
+
+        async def record(event):
+            received.append(event.type)
+
+        emitter.on_all(record)
+
+        with pytest.raises(ValueError):
+            async with emitter.batch(flush_every=100):
+                await emitter.emit(_event(EventType.STEP_START))
+                await emitter.emit(_event(EventType.STEP_END))
+                assert received == []
+                raise ValueError("body failed")
+
+        assert received == [EventType.STEP_START, EventType.STEP_END]
+
+    @pytest.mark.asyncio
+    async def test_events_emitted_during_final_flush_are_dispatched(self):
+        emitter = EventEmitter()
+        received = []
+
+        async def record(event):
+            received.append(event.type)
+            if event.type is EventType.STEP_START:
+                await emitter.emit(_event(EventType.STEP_END))
+
+        emitter.on_all(record)
+
+        async with emitter.batch(flush_every=100):
+            await emitter.emit(_event(EventType.STEP_START))
+
+        assert received == [EventType.STEP_START, EventType.STEP_END]
+
+        # Batching ended: emits dispatch immediately again
+        await emitter.emit(_event(EventType.COMPLETION))
+        assert received[-1] is EventType.COMPLETION
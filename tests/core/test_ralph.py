@@ -144,6 +144,19 @@ class TestCompletionDetector:
         assert result.completed is True
         assert result.reason == CompletionCondition.PROMISE_TAG
 
+    def test_promise_detection_before_long_trailer(self):
+        config = RalphConfig(
+            completion_conditions=[CompletionCondition.PROMISE_TAG]
+        )
+        detector = CompletionDetector(config)
+
+        result = detector.check(
+            content="<promise>TASK COMPLETE</promise>\n" + "Summary line.\n" * 500,
+            iteration=1,
+            files_modified=set(),
+        )
+        assert result.completed is True
+
     def test_max_iterations(self):
         config = RalphConfig(
             max_iterations=5,
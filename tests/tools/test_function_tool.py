@@ -0,0 +1,44 @@
+"""Tests for FunctionTool."""
+
+import asyncio
+import threading
+
+import pytest
+
+from omni_agent.tools.function_tool import FunctionTool
+
+
+@pytest.mark.asyncio
+async def test_sync_function_runs_in_worker_thread():
+    """Sync functions run off the event loop thread."""
+    def current_thread() -> str:
+        return threading.current_thread().name
+
+    result = await FunctionTool(current_thread).execute()
+
+    assert result.success is True
+    assert result.content != threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_async_function_runs_on_event_loop():
+    """Async functions are awaited directly on the loop."""
+    async def current_loop() -> str:
+        return str(id(asyncio.get_running_loop()))
+
+    result = await FunctionTool(current_loop).execute()
+
+    assert result.content == str(id(asyncio.get_running_loop()))
+
+
+@pytest.mark.asyncio
+async def test_sync_function_cannot_reach_event_loop():
+    """A sync function that touches the running loop fails as a tool error."""
+    def needs_loop() -> str:
+        asyncio.get_running_loop()
+        return "unreachable"
+
+    result = await FunctionTool(needs_loop).execute()
+
+    assert result.success is False
+    assert "no running event loop" in result.error